@@ -13,26 +13,22 @@ Features:
   - Text-to-speech functionality (not implemented in this code).
 """
 
+import hashlib
 import warnings
-import asyncio
-import ollama
 import streamlit as st
 from audio_recorder_streamlit import audio_recorder
-from src.ukrainian_stt import ua_transcribe
-from src.english_stt import en_transcribe
-from src.transcribe_speak import transcribe_and_speak
-from src.utils import convert_audio_to_wav, check_language
-from src.identify_lang import identify_language
-from config import SYS_MSG
+from src.segmenter import SentenceSegmenter
+from src.speech_pipeline import get_speech_pipeline
+from src.utils import check_language
+from src.context import ContextManager
+from src.llm_client import chat_stream, warm_up_in_background
+from src.model_registry import warm_up_models_in_background
+from src.tracing import TRACER
+from config import OLLAMA_MODEL, SYS_MSG, WARM_START
 
 # Suppress warnings
 warnings.filterwarnings("ignore")
 
-# File paths
-RECORDED_WAV_FILE = "./data/wav/microphone_stereo.wav"
-CONV_WAV_FILE = "./data/wav/converted_mono.wav"
-WAV_FILE = "./data/wav/chunk.wav"
-
 # Initial conversation history
 HISTORY = [{"role": "system", "content": SYS_MSG}]
 
@@ -46,19 +42,57 @@ st.set_page_config(
 )
 
 
-def ollama_prompt(model="llama3.1", messages=None):
+# Streamlit re-runs this script on every interaction, heavy objects are created once per process
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    """Starts loading the LLM, the STT/LID models (kept in the model registry) and TTS.
+
+    Loading happens in the background: the page (and typed chat) is usable right away.
+    """
+    return warm_up_in_background(), warm_up_models_in_background()
+
+
+@st.cache_resource(show_spinner=False)
+def speech_pipeline():
+    """Speech pipeline with its synthesis/playback threads and the audio mixer."""
+    return get_speech_pipeline()
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def convert_recording(audio_hash: str, _audio_bytes: bytes):  # pylint: disable=unused-argument
+    """Converts a recording to 16 kHz mono samples, once per distinct recording.
+
+    Args:
+        audio_hash (str): sha256 of the recording, the cache key.
+        _audio_bytes (bytes): The recording (not hashed by Streamlit).
+
+    Returns:
+        np.ndarray: float32 samples without leading/trailing silence, accepted by all recognizers.
+    """
+    from src.audio import load_recording  # pylint: disable=import-outside-toplevel
+
+    # Decoded in memory: no files are written, so concurrent sessions can't clash
+    with TRACER.span("audio.convert", size=len(_audio_bytes)):
+        return load_recording(_audio_bytes)
+
+
+if WARM_START:
+    start_warm_up()
+
+
+def ollama_prompt(model=OLLAMA_MODEL, messages=None):
     """
     Sends a prompt to the Ollama LLM and returns a stream of responses.
 
     Args:
-        model (str, optional): The Ollama model to use. Defaults to "llama3.1".
+        model (str, optional): The Ollama model to use. Defaults to OLLAMA_MODEL.
         messages (list, optional): A list of dictionaries representing the conversation history.
                                   Defaults to None.
 
     Returns:
         stream: An asynchronous stream of dictionaries containing the LLM's responses.
     """
-    stream = ollama.chat(model=model, messages=messages, stream=True)
+    stream = chat_stream(messages=messages, model=model)
     return stream
 
 
@@ -72,25 +106,21 @@ def stream_parser(stream):
     Yields:
         str: Each chunk of the LLM's response.
     """
-    sentence_chunks, response_text = "", ""
+    segmenter, response_text = SentenceSegmenter(), ""
+    speech = speech_pipeline()
     st.session_state.messages.append({"role": "assistant", "content": response_text})
     print("Assistant: ", end="")
     for chunk in stream:
         print(chunk["message"]["content"], end="", flush=True)
         content = chunk["message"]["content"]
-        sentence_chunks += content
         response_text += content
         st.session_state.messages[-1]["content"] += content
-        if sentence_chunks.endswith(
-            ('."', "\n\n", "**:", ".", "!", "?", '?"', '!"', ":")
-        ):
-            if any("\u0400" <= char <= "\u04FF" for char in sentence_chunks):
-                lang = "ua"
-            else:
-                lang = "en"
-            asyncio.run(transcribe_and_speak(text=sentence_chunks, lang=lang))
-            sentence_chunks = ""
+        for sentence, lang in segmenter.feed(content):
+            speech.say(text=sentence, lang=lang)
         yield chunk["message"]["content"]
+    for sentence, lang in segmenter.flush():
+        speech.say(text=sentence, lang=lang)
+    speech.wait()
 
 
 def stop_running():
@@ -110,12 +140,11 @@ with col1:
     audio_bytes = audio_recorder(
         text="", energy_threshold=0.01, icon_size="5x"
     )  # if energy_threshold negative - never stops
+RECORDING = None  # nothing to transcribe until something is recorded in this session
 if audio_bytes is not None and len(audio_bytes) != 44:
     st.audio(audio_bytes, format="audio/wav")
-    with open(file=RECORDED_WAV_FILE, mode="wb") as f:
-        f.write(audio_bytes)
-        f.close()
-    convert_audio_to_wav(audio_file=RECORDED_WAV_FILE, output_file=CONV_WAV_FILE)
+    # Reruns (e.g. button clicks) reuse the conversion of the same recording
+    RECORDING = convert_recording(hashlib.sha256(audio_bytes).hexdigest(), audio_bytes)
 # Choose language buttons
 with col2:
     PRMPT = None
@@ -124,43 +153,52 @@ with col2:
         if st.button("Stop", use_container_width=True, type="primary"):
             stop_running()
     with button1:
-        if st.button("Говорю (UA)", use_container_width=True):
-            PRMPT = "ua:" + ua_transcribe(CONV_WAV_FILE)
+        if st.button("Говорю (UA)", use_container_width=True, disabled=RECORDING is None):
+            TRACER.start_turn(source="ua")
+            from src.ukrainian_stt import ua_transcribe  # torch & transformers, on first use
+
+            PRMPT = "ua:" + ua_transcribe(RECORDING)
             print(PRMPT)
     with button2:
-        if st.button("Talking (EN)", use_container_width=True):
-            PRMPT = "en:" + en_transcribe(CONV_WAV_FILE)
+        if st.button("Talking (EN)", use_container_width=True, disabled=RECORDING is None):
+            TRACER.start_turn(source="en")
+            from src.english_stt import en_transcribe
+
+            PRMPT = "en:" + en_transcribe(RECORDING)
             print(PRMPT)
     with button3:
-        if st.button("Automatic", use_container_width=True):
-            DEF_LANG = "???"
-            DEF_LANG = identify_language(CONV_WAV_FILE)
-            if DEF_LANG in [
-                ["uk: Ukrainian"],
-                ["pl: Polish"],
-                ["ru: Russian"],
-                ["be: Belarusian"],
-            ]:
-                PRMPT = "ua:" + ua_transcribe(CONV_WAV_FILE)
+        if st.button("Automatic", use_container_width=True, disabled=RECORDING is None):
+            TRACER.start_turn(source="auto")
+            from src.dispatch import transcribe_auto
+
+            LANG, TEXT = transcribe_auto(RECORDING)
+            if LANG == "ua":
+                PRMPT = "ua:" + TEXT
                 print(PRMPT)
             else:
-                PRMPT = "en:" + en_transcribe(CONV_WAV_FILE)
-                if PRMPT == "Didn't recognize that.":
+                PRMPT = "en:" + TEXT
+                if TEXT == "Didn't recognize that.":
                     print(PRMPT)
                     PRMPT = None
+                    TRACER.end_turn(recognized=False)
                 else:
                     print(PRMPT)
     user_prompt = st.chat_input(placeholder="Краще напишу/I'll write instead")
     if user_prompt is not None:
+        TRACER.start_turn(source="text")
         user_prompt = check_language(user_prompt=user_prompt)
 # Checks for existing messages in session state
 if "messages" not in st.session_state:
-    st.session_state.messages = HISTORY
+    st.session_state.messages = list(HISTORY)  # a copy, HISTORY is shared by all sessions
+if "context" not in st.session_state:
+    st.session_state.context = ContextManager()
 
-# Display chat messages from session state
-for message in st.session_state.messages:
-    with my_slot2.chat_message(message["role"]):
-        st.markdown(message["content"])
+# my_slot2 holds a single element, so only the last message is rendered (a new answer
+# replaces it below); the system prompt is never shown
+LAST_MESSAGE = st.session_state.messages[-1]
+if user_prompt is None and PRMPT is None and LAST_MESSAGE["role"] != "system":
+    with my_slot2.chat_message(LAST_MESSAGE["role"]):
+        st.markdown(LAST_MESSAGE["content"])
 
 if user_prompt is not None or PRMPT is not None:
     # Display user prompt in chat message widget
@@ -173,12 +211,13 @@ if user_prompt is not None or PRMPT is not None:
     # adds user's prompt to session state
     st.session_state.messages.append({"role": "user", "content": user_prompt or PRMPT})
 
-    # retrieves response from model
+    # retrieves response from model (system prompt, summary of older turns and recent ones)
     LLM_STREAM = ollama_prompt(
-        messages=st.session_state.messages,
+        messages=st.session_state.context.build(st.session_state.messages),
     )
     with my_slot2.chat_message("assistant"):
         try:
             st.write(stream_parser(LLM_STREAM))
         except stop_running():
             pass
+    TRACER.end_turn()
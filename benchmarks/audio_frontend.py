@@ -0,0 +1,141 @@
+"""Benchmark of the recording front end: NumPy in memory vs the file-based conversion
+
+Converts recordings like the ones audio_recorder sends (44.1 kHz stereo 16-bit WAV,
+speech surrounded by quiet room noise) to the 16 kHz mono array the recognizers take:
+  - legacy  write the bytes to a file, utils.convert_audio_to_wav() (speech_recognition
+            AudioFile + audioop resampling) writes a second file, read_audio() reads it
+  - numpy   audio.load_recording(): decode, downmix, resample, trim, all in memory
+For each recording length it reports the median conversion time, the peak memory
+allocated during one conversion (tracemalloc, also as a multiple of the recording size,
+i.e. roughly how many copies of it are alive at once), the bytes written to and read
+from files (Linux only) and the output length. "match" is the correlation of the
+untrimmed NumPy output with the legacy one (1.0 = same audio).
+
+Usage:
+    python -m benchmarks.audio_frontend [--seconds 3 10 30] [--runs 5] [--files rec.wav ...]
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import wave
+
+import numpy as np
+
+sys.path.append("./")
+from src.audio import SAMPLE_RATE, load_recording, read_audio
+from src.utils import convert_audio_to_wav
+
+RECORDER_RATE = 44100
+
+
+def make_recording(seconds: float, rate=RECORDER_RATE, channels=2, seed=0) -> bytes:
+    """WAV bytes of `seconds` of speech-like sound with a second of quiet noise on each side."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    # Syllables: harmonics of a gliding pitch, switched on and off four times a second
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8)) * (np.sin(2 * np.pi * 4 * t) > -0.3)
+    quiet = np.zeros(rate)
+    audio = np.concatenate((quiet, 0.2 * voice, quiet))
+    audio += 0.002 * rng.standard_normal(len(audio))
+    frames = np.repeat(audio[:, None], channels, axis=1)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as file:
+        file.setnchannels(channels)
+        file.setsampwidth(2)
+        file.setframerate(rate)
+        file.writeframes((np.clip(frames, -1, 1) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+def legacy(data: bytes) -> np.ndarray:
+    """The old path of app.py: two WAV files on disk and three reads."""
+    with tempfile.TemporaryDirectory() as directory:
+        recorded = os.path.join(directory, "microphone_stereo.wav")
+        converted = os.path.join(directory, "converted_mono.wav")
+        with open(recorded, "wb") as file:
+            file.write(data)
+        convert_audio_to_wav(audio_file=recorded, output_file=converted)
+        return read_audio(converted)
+
+
+FRONT_ENDS = {"legacy": legacy, "numpy": load_recording}
+
+
+def io_bytes():
+    """Bytes this process has read and written through system calls, None if unknown."""
+    try:
+        with open("/proc/self/io", "r", encoding="ascii") as file:
+            counters = dict(line.split(": ") for line in file.read().splitlines())
+    except OSError:
+        return None
+    return int(counters["rchar"]) + int(counters["wchar"])
+
+
+def measure(function, data: bytes, runs: int) -> dict:
+    """Median seconds over `runs` calls (after a warm-up), peak traced memory and file I/O of one call."""
+    audio = function(data)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(data)
+        times.append(time.perf_counter() - start)
+    before = io_bytes()
+    tracemalloc.start()
+    function(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    after = io_bytes()
+    return {
+        "seconds": statistics.median(times),
+        "peak_bytes": peak,
+        "io_bytes": after - before if before is not None else None,
+        "samples": len(audio),
+    }
+
+
+def correlation(a: np.ndarray, b: np.ndarray) -> float:
+    """Pearson correlation of two signals over their common length."""
+    length = min(len(a), len(b))
+    return float(np.corrcoef(a[:length], b[:length])[0, 1])
+
+
+def main(recordings: dict, runs=5) -> None:
+    """Measures both front ends on every recording and prints the comparison."""
+    print(f"{'recording':>12}{'front end':>11}{'ms':>9}{'peak MB':>9}{'copies':>8}{'I/O MB':>8}"
+          f"{'out s':>8}{'match':>7}")
+    for name, data in recordings.items():
+        results = {front_end: measure(function, data, runs) for front_end, function in FRONT_ENDS.items()}
+        match = correlation(load_recording(data, trim=False), legacy(data))
+        for front_end, result in results.items():
+            file_io = "n/a" if result["io_bytes"] is None else f"{result['io_bytes'] / 1024 ** 2:.1f}"
+            print(
+                f"{name:>12}{front_end:>11}{result['seconds'] * 1000:>9.1f}"
+                f"{result['peak_bytes'] / 1024 ** 2:>9.1f}{result['peak_bytes'] / len(data):>8.1f}{file_io:>8}"
+                f"{result['samples'] / SAMPLE_RATE:>8.2f}{match if front_end == 'numpy' else 1.0:>7.3f}"
+            )
+        speedup = results["legacy"]["seconds"] / results["numpy"]["seconds"]
+        memory = results["numpy"]["peak_bytes"] / results["legacy"]["peak_bytes"]
+        print(f"{'':>23} numpy: {speedup:.1f}x faster, peak memory {memory:.1f}x of legacy")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the NumPy audio front end with the legacy one.")
+    parser.add_argument("--seconds", nargs="+", type=float, default=[3, 10, 30],
+                        help="lengths of speech in the generated recordings")
+    parser.add_argument("--files", nargs="*", default=[], help="WAV recordings to convert as well")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    RECORDINGS = {f"{seconds:g}s+2s": make_recording(seconds) for seconds in args.seconds}
+    for path in args.files:
+        with open(path, "rb") as f:
+            RECORDINGS[os.path.basename(path)[-12:]] = f.read()
+    main(RECORDINGS, args.runs)
@@ -0,0 +1,90 @@
+"""Benchmark of the speech models on CPU: fp32 vs int8 vs ONNX Runtime
+
+Runs Ukrainian STT on data/wav/UA_test.wav and language ID on UA_test.wav and
+EN_test.wav with every engine, and reports load time, real-time factor (processing
+time / audio duration, lower is better), WER of the transcript and LID accuracy.
+
+WER is measured against --reference if given, otherwise against the fp32 transcript
+(so it shows what quantization costs, not absolute quality).
+
+Usage:
+    python -m benchmarks.inference [--runs 5] [--engines fp32 int8 onnx] [--reference "..."]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+
+import soundfile as sf
+
+sys.path.append("./")
+from benchmarks.metrics import wer
+from src.identify_lang import identify_language, load_lid_model
+from src.model_registry import REGISTRY
+from src.ukrainian_stt import load_ua_model, ua_transcribe_batch
+
+UA_SAMPLE = "./data/wav/UA_test.wav"
+LID_SAMPLES = [("./data/wav/UA_test.wav", "uk"), ("./data/wav/EN_test.wav", "en")]
+
+
+def timed(function, runs: int):
+    """Runs function once to warm up, then `runs` times; returns (result, median seconds)."""
+    result = function()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times)
+
+
+def bench_stt(engine: str, runs: int) -> dict:
+    """Measures Ukrainian STT with one engine on CPU."""
+    start = time.perf_counter()
+    load_ua_model(device="cpu", engine=engine)
+    load_time = time.perf_counter() - start
+    text, seconds = timed(lambda: ua_transcribe_batch([UA_SAMPLE], device="cpu", engine=engine)[0], runs)
+    return {"load": load_time, "rtf": seconds / sf.info(UA_SAMPLE).duration, "text": text}
+
+
+def bench_lid(engine: str, runs: int) -> dict:
+    """Measures language ID with one engine on CPU."""
+    start = time.perf_counter()
+    load_lid_model(device="cpu", engine=engine)
+    load_time = time.perf_counter() - start
+    correct, rtfs = 0, []
+    for path, expected in LID_SAMPLES:
+        label, seconds = timed(lambda path=path: identify_language(path, engine=engine, device="cpu"), runs)
+        correct += label[0].startswith(expected + ":")
+        rtfs.append(seconds / sf.info(path).duration)
+    return {"load": load_time, "rtf": statistics.mean(rtfs), "accuracy": correct / len(LID_SAMPLES)}
+
+
+def main(engines, runs, reference=None) -> None:
+    """Benchmarks each engine and prints a table."""
+    stt = {}
+    for engine in engines:
+        stt[engine] = bench_stt(engine, runs)
+        REGISTRY.unload()  # keep only one copy of the weights in memory
+    reference = reference or stt.get("fp32", next(iter(stt.values())))["text"]
+
+    print(f"{'model':10} {'engine':6} {'load, s':>8} {'RTF':>7} {'WER/accuracy':>13}")
+    for engine, result in stt.items():
+        print(f"{'w2v-bert':10} {engine:6} {result['load']:8.2f} {result['rtf']:7.3f} "
+              f"{wer(reference, result['text']):13.3f}")
+    for engine in dict.fromkeys("int8" if engine == "onnx" else engine for engine in engines):
+        result = bench_lid(engine, runs)
+        REGISTRY.unload()
+        print(f"{'ecapa-lid':10} {engine:6} {result['load']:8.2f} {result['rtf']:7.3f} "
+              f"{result['accuracy']:13.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare CPU inference engines.")
+    parser.add_argument("--engines", nargs="+", default=["fp32", "int8", "onnx"],
+                        choices=["fp32", "int8", "onnx"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--reference", help="correct transcript of UA_test.wav")
+    args = parser.parse_args()
+    main(args.engines, args.runs, args.reference)
@@ -0,0 +1,30 @@
+"""Accuracy metrics shared by the benchmarks (no model dependencies)"""
+
+import re
+
+
+def words(text: str) -> list:
+    """Lowercase words of text, punctuation dropped (apostrophes kept: "don't", "м'ята")."""
+    return re.findall(r"[\w'’]+", text.lower())
+
+
+def wer(reference: str, hypothesis: str) -> float:
+    """Word error rate: word-level edit distance divided by reference length."""
+    ref, hyp = words(reference), words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, start=1):
+            current[j] = min(
+                previous[j] + 1,  # deletion
+                current[j - 1] + 1,  # insertion
+                previous[j - 1] + (ref_word != hyp_word),  # substitution
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+if __name__ == "__main__":
+    print(wer("How do you say apple in Ukrainian?", "how do you say an apple in ukrainian"))
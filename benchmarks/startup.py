@@ -0,0 +1,103 @@
+"""Startup time of the entry points
+
+Each target is imported in a fresh interpreter with `python -X importtime`:
+  - main  the console entry point (main.py, the module only, main() isn't called)
+  - app   the modules app.py imports at the top (Streamlit runs the rest of the
+          script on every rerun, so this is what the first page render waits for)
+Reported are the import wall time, the slowest imports (cumulative) and any heavy
+module (torch, transformers, speechbrain, pygame, edge_tts, speech_recognition) that
+got imported at startup although it should only load on first use or in the
+background warm-up. Exit code 1 if a target misses --target seconds or loads a heavy
+module.
+
+Usage:
+    python -m benchmarks.startup [--targets main app] [--top 15] [--target 1.0]
+"""
+
+import argparse
+import ast
+import subprocess
+import sys
+
+HEAVY_MODULES = ("torch", "transformers", "speechbrain", "pygame", "edge_tts", "speech_recognition")
+STARTUP_TARGET_S = 1.0
+
+
+def entry_imports(path: str) -> str:
+    """Returns the module-level import statements of a script as code."""
+    with open(path, "r", encoding="utf-8") as file:
+        source = file.read()
+    imports = [node for node in ast.parse(source).body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.get_source_segment(source, node) for node in imports)
+
+
+TARGETS = {
+    "main": lambda: "import main",
+    "app": lambda: entry_imports("app.py"),
+}
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+exec(compile({code!r}, "<startup>", "exec"))
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(repr((elapsed, heavy)))
+"""
+
+
+def parse_importtime(stderr: str) -> list:
+    """Parses `-X importtime` output into (cumulative us, self us, module) tuples."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, module = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative), int(own), module.rstrip()))
+    return rows
+
+
+def measure(target: str) -> dict:
+    """Imports a target in a fresh interpreter.
+
+    Returns:
+        dict: seconds (import wall time), heavy (heavy modules loaded), imports (parsed
+            importtime rows) or error (stderr tail if the import failed).
+    """
+    code = _PROBE.format(code=TARGETS[target](), heavy=HEAVY_MODULES)
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=False
+    )
+    if process.returncode != 0:
+        return {"error": process.stderr.strip().splitlines()[-1]}
+    seconds, heavy = ast.literal_eval(process.stdout.strip().splitlines()[-1])
+    return {"seconds": seconds, "heavy": heavy, "imports": parse_importtime(process.stderr)}
+
+
+def main(targets, top=15, target_s=STARTUP_TARGET_S) -> int:
+    """Measures the targets, prints the import-time report and returns the exit code."""
+    failed = False
+    for name in targets:
+        result = measure(name)
+        if "error" in result:
+            print(f"{name}: import failed; {result['error']}")
+            failed = True
+            continue
+        verdict = "ok" if result["seconds"] <= target_s and not result["heavy"] else "SLOW"
+        failed = failed or verdict != "ok"
+        print(f"\n{name}: {result['seconds']:.3f}s (target {target_s:.1f}s) {verdict}")
+        if result["heavy"]:
+            print("  heavy modules loaded at startup:", ", ".join(result["heavy"]))
+        print(f"  {'cumulative, ms':>14} {'self, ms':>9}  module")
+        for cumulative, own, module in sorted(result["imports"], reverse=True)[:top]:
+            print(f"  {cumulative / 1000:14.1f} {own / 1000:9.1f}  {module}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure startup (import) time of the entry points.")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to show")
+    parser.add_argument("--target", type=float, default=STARTUP_TARGET_S, help="seconds")
+    args = parser.parse_args()
+    sys.exit(main(args.targets, args.top, args.target))
@@ -0,0 +1,319 @@
+"""Offline benchmark suite for the voice pipeline
+
+Runs every stage over the fixed corpus in benchmarks/corpus.json, with no network:
+  - lid       language ID verdict (Ukrainian-family or not), accuracy vs corpus lang
+  - stt_ua    Ukrainian STT, WER vs corpus text where given: the espeak-ng clips
+              (UA_coffee, EN_apple) have the text they were synthesized from, the
+              recordings UA_test and EN_test are only used for timing and language ID
+  - stt_en    English STT against a local FakeGoogleSTTServer (FLAC encoding + HTTP;
+              the fake returns the corpus text, so WER only checks the round-trip)
+  - splitter  sentence segmentation of LLM answers fed token by token
+  - tts       edge-tts synthesis against a local FakeEdgeTTSServer
+For each it reports latency percentiles, throughput, peak RSS of the process so far
+and accuracy. Results are saved as JSON; two result files can be compared to catch
+regressions (exit code 1 if any stage got slower than --tolerance, used more memory
+than --rss-tolerance or got less accurate).
+
+Usage:
+    python -m benchmarks.suite [--runs 3] [--only splitter tts] [--output results.json]
+    python -m benchmarks.suite --compare baseline.json results.json [--tolerance 0.1] [--rss-tolerance 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import re
+import resource
+import sys
+import time
+
+import soundfile as sf
+
+sys.path.append("./")
+from benchmarks.metrics import wer
+from src.audio import read_audio
+from src.segmenter import SentenceSegmenter, split_sentences
+from config import LID_UA_FAMILY
+
+CORPUS = "./benchmarks/corpus.json"
+# Light stages first: peak RSS is a process-wide high-water mark
+BENCHMARKS = ("splitter", "tts", "stt_en", "lid", "stt_ua")
+
+
+def load_corpus(path=CORPUS) -> dict:
+    """Reads the corpus: {"audio": [{"path", "lang", "text"}], "texts": [str]}."""
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def percentiles(values: list) -> dict:
+    """Returns mean, p50, p90 and p99 of `values` (nearest rank)."""
+    values = sorted(values)
+
+    def rank(q):
+        return values[min(len(values) - 1, max(0, round(q * (len(values) - 1))))]
+
+    return {"mean": sum(values) / len(values), "p50": rank(0.5), "p90": rank(0.9), "p99": rank(0.99)}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process, MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024  # bytes on macOS
+
+
+def measure(items: list, function, runs: int) -> tuple:
+    """Calls function(item) for every item `runs` times after one warm-up pass.
+
+    Returns:
+        tuple: (results of the last pass, latencies in seconds, total seconds)
+    """
+    results = [function(item) for item in items]
+    latencies = []
+    for _ in range(runs):
+        results = []
+        for item in items:
+            start = time.perf_counter()
+            results.append(function(item))
+            latencies.append(time.perf_counter() - start)
+    return results, latencies, sum(latencies)
+
+
+def _report(latencies, total, work, unit, runs, **quality) -> dict:
+    return {
+        "n": len(latencies),
+        "latency": percentiles(latencies),
+        "throughput": work * runs / total,
+        "unit": unit,
+        "peak_rss_mb": peak_rss_mb(),
+        **quality,
+    }
+
+
+def _mean_wer(pairs) -> dict:
+    scored = [wer(reference, hypothesis) for reference, hypothesis in pairs if reference]
+    return {"wer": sum(scored) / len(scored)} if scored else {}
+
+
+def bench_lid(corpus: dict, runs: int) -> dict:
+    """Language ID: ms per utterance, audio seconds per second, verdict accuracy."""
+    from src.identify_lang import detect_ua_family  # pylint: disable=import-outside-toplevel
+
+    audio = [read_audio(entry["path"]) for entry in corpus["audio"]]
+    verdicts, latencies, total = measure(audio, lambda samples: detect_ua_family(samples)["ua"], runs)
+    expected = [entry["lang"] in LID_UA_FAMILY for entry in corpus["audio"]]
+    accuracy = sum(v == e for v, e in zip(verdicts, expected)) / len(expected)
+    seconds = sum(sf.info(entry["path"]).duration for entry in corpus["audio"])
+    return _report(latencies, total, seconds, "audio s/s", runs, accuracy=accuracy)
+
+
+def bench_stt_ua(corpus: dict, runs: int) -> dict:
+    """Ukrainian STT on the Ukrainian part of the corpus."""
+    from src.ukrainian_stt import ua_transcribe  # pylint: disable=import-outside-toplevel
+
+    entries = [entry for entry in corpus["audio"] if entry["lang"] == "uk"]
+    audio = [read_audio(entry["path"]) for entry in entries]
+    texts, latencies, total = measure(audio, ua_transcribe, runs)
+    seconds = sum(sf.info(entry["path"]).duration for entry in entries)
+    quality = _mean_wer(zip((entry["text"] for entry in entries), texts))
+    return _report(latencies, total, seconds, "audio s/s", runs, **quality)
+
+
+def bench_stt_en(corpus: dict, runs: int) -> dict:
+    """English STT through recognize_google() against a local fake recognizer."""
+    # pylint: disable=import-outside-toplevel
+    from src.english_stt import en_transcribe
+    from src.fake_servers import FakeGoogleSTTServer
+
+    entries = [entry for entry in corpus["audio"] if entry["lang"] == "en"]
+    server = FakeGoogleSTTServer()
+    endpoint = server.start_in_thread()
+
+    def transcribe(entry):
+        server.transcript = entry["text"] or "fake transcript"
+        return en_transcribe(read_audio(entry["path"]), endpoint=endpoint)
+
+    try:
+        texts, latencies, total = measure(entries, transcribe, runs)
+    finally:
+        server.stop_thread()
+    seconds = sum(sf.info(entry["path"]).duration for entry in entries)
+    quality = _mean_wer(zip((entry["text"] for entry in entries), texts))
+    return _report(latencies, total, seconds, "audio s/s", runs, **quality)
+
+
+def bench_splitter(corpus: dict, runs: int) -> dict:
+    """Sentence segmentation of whole answers arriving as LLM-sized tokens."""
+    streams = [re.findall(r"\S+\s*", text) for text in corpus["texts"]]
+
+    def segment(tokens):
+        segmenter, segments = SentenceSegmenter(), []
+        for token in tokens:
+            segments += segmenter.feed(token)
+        return segments + segmenter.flush()
+
+    results, latencies, total = measure(streams, segment, runs)
+    chars = sum(len(text) for text in corpus["texts"])
+    report = _report(latencies, total, chars, "chars/s", runs)
+    report["segments"] = sum(len(segments) for segments in results)
+    return report
+
+
+def bench_tts(corpus: dict, runs: int) -> dict:
+    """Synthesis of every segment of the corpus answers by a local fake edge-tts."""
+    # pylint: disable=import-outside-toplevel
+    from src.fake_servers import FakeEdgeTTSServer
+    from src.tts_backends import EdgeTTSBackend
+    from src.tts_backends import measure as measure_tts
+
+    sentences = [segment for text in corpus["texts"] for segment in split_sentences(text)]
+
+    async def run():
+        server = FakeEdgeTTSServer()
+        backend = EdgeTTSBackend(endpoint=await server.start())
+        try:
+            timings = []
+            for number in range(runs + 1):  # the first pass is a warm-up
+                for text, lang in sentences:
+                    timing = await measure_tts(backend, text, lang)
+                    if number:
+                        timings.append(timing)
+            return timings
+        finally:
+            await server.stop()
+
+    timings = asyncio.run(run())
+    latencies = [timing["total"] for timing in timings]
+    report = _report(latencies, sum(latencies), len(sentences), "sentences/s", runs)
+    report["first_chunk"] = percentiles([timing["first_chunk"] or 0.0 for timing in timings])
+    return report
+
+
+BENCHES = {
+    "lid": bench_lid,
+    "stt_ua": bench_stt_ua,
+    "stt_en": bench_stt_en,
+    "splitter": bench_splitter,
+    "tts": bench_tts,
+}
+
+
+def run_suite(names, runs=3, corpus_path=CORPUS) -> dict:
+    """Runs the selected benchmarks and returns the results (see main for the format)."""
+    corpus = load_corpus(corpus_path)
+    results = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.platform(),
+            "runs": runs,
+            "corpus": corpus_path,
+        },
+        "benchmarks": {},
+    }
+    for name in names:
+        print(f"Running {name}...", flush=True)
+        results["benchmarks"][name] = BENCHES[name](corpus, runs)
+    return results
+
+
+def format_results(results: dict) -> str:
+    """Formats results as a table, latencies in ms."""
+    lines = [f"{'stage':10}{'n':>5}{'p50':>9}{'p90':>9}{'p99':>9}{'throughput':>20}"
+             f"{'RSS, MB':>9}{'quality':>16}"]
+    for name, result in results["benchmarks"].items():
+        latency = result["latency"]
+        quality = ""
+        if "accuracy" in result:
+            quality = f"acc {result['accuracy']:.2f}"
+        elif "wer" in result:
+            quality = f"WER {result['wer']:.3f}"
+        throughput = f"{result['throughput']:.1f} {result['unit']}"
+        lines.append(
+            f"{name:10}{result['n']:>5}{latency['p50'] * 1000:>9.1f}{latency['p90'] * 1000:>9.1f}"
+            f"{latency['p99'] * 1000:>9.1f}{throughput:>20}{result['peak_rss_mb']:>9.0f}{quality:>16}"
+        )
+    return "\n".join(lines)
+
+
+def compare(baseline: dict, current: dict, tolerance=0.1, rss_tolerance=0.2) -> tuple:
+    """Compares two result files.
+
+    Args:
+        baseline (dict): Earlier results.
+        current (dict): New results.
+        tolerance (float, optional): Allowed relative increase of p50/p90 latency and
+            drop of throughput.
+        rss_tolerance (float, optional): Allowed relative increase of peak RSS.
+
+    Returns:
+        tuple: (report lines, list of regressions)
+    """
+    lines, regressions = [f"{'stage':10}{'metric':>14}{'before':>12}{'after':>12}{'change':>9}"], []
+    for name, new in current["benchmarks"].items():
+        old = baseline["benchmarks"].get(name)
+        if old is None:
+            continue
+        rows = [(f"{q} ms", old["latency"][q] * 1000, new["latency"][q] * 1000, True)
+                for q in ("p50", "p90")]
+        rows.append(("throughput", old["throughput"], new["throughput"], False))
+        rows.append(("RSS, MB", old["peak_rss_mb"], new["peak_rss_mb"], True))
+        for metric, lower_is_better in (("accuracy", False), ("wer", True)):
+            if metric in old and metric in new:
+                rows.append((metric, old[metric], new[metric], lower_is_better))
+        for metric, before, after, lower_is_better in rows:
+            change = (after - before) / before if before else 0.0
+            flag = ""
+            if metric in ("accuracy", "wer"):
+                worse = after - before if lower_is_better else before - after
+                if worse > 0.01:
+                    flag = "  <-- worse"
+            elif metric == "RSS, MB":
+                if change > rss_tolerance:
+                    flag = "  <-- more memory"
+            elif change > tolerance if lower_is_better else change < -tolerance:
+                flag = "  <-- slower"
+            if flag:
+                regressions.append(f"{name} {metric}")
+            lines.append(f"{name:10}{metric:>14}{before:>12.4g}{after:>12.4g}{change:>+9.1%}{flag}")
+    return lines, regressions
+
+
+def main() -> int:
+    """Command line entry point, returns the exit code."""
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the voice pipeline.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--output", help="save results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="compare two result files instead of running")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="allowed relative latency increase (or throughput drop) when comparing")
+    parser.add_argument("--rss-tolerance", type=float, default=0.2,
+                        help="allowed relative peak RSS increase when comparing")
+    args = parser.parse_args()
+
+    if args.compare:
+        results = []
+        for path in args.compare:
+            with open(path, "r", encoding="utf-8") as file:
+                results.append(json.load(file))
+        lines, regressions = compare(*results, tolerance=args.tolerance, rss_tolerance=args.rss_tolerance)
+        print("\n".join(lines))
+        if regressions:
+            print("Regressions:", ", ".join(regressions))
+            return 1
+        return 0
+
+    results = run_suite([name for name in BENCHMARKS if name in args.only], args.runs, args.corpus)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,3 +9,120 @@ sentence. You can provide your response entirely in English or entirely in Ukrai
 If you need to use words from both languages in the same sentence, consider transliterating \
 (especially names!) one of them. If prompt contain 'ua:' answer in UA if contain 'en:' in english \
 (both ways use transliteration if needed)"
+
+# Models are loaded once per process and kept in memory up to this budget (MB),
+# least recently used ones are unloaded first. 0 disables eviction.
+MODEL_MEMORY_BUDGET_MB = 6144
+# Load STT/LID models at startup so the first request is as fast as later ones
+WARM_START = True
+
+# Voice activity detection: silence (ms) that ends an utterance and the minimal
+# speech energy (RMS of float samples, ~500 on the int16 scale)
+VAD_PAUSE_MS = 800
+VAD_ENERGY_FLOOR = 0.015
+
+# Recordings (app.py, server.py) are trimmed to the speech: leading and trailing audio
+# AUDIO_TRIM_DB quieter than the loudest part is cut, AUDIO_TRIM_PAD_MS are kept around it
+# (relative to the recording only, so quiet speech isn't cut by an absolute floor)
+AUDIO_TRIM_SILENCE = True
+AUDIO_TRIM_DB = 35
+AUDIO_TRIM_PAD_MS = 200
+
+# Print speech pipeline timings (queue depth, synthesis/playback times) after each answer
+SPEECH_REPORT = False
+
+# Synthesized speech cache: disk and memory budgets (MB)
+TTS_CACHE_DIR = "./data/tts_cache"
+TTS_CACHE_MAX_MB = 256
+TTS_CACHE_MEMORY_MB = 32
+
+# Speech synthesizer: "edge" (online), "espeak" (offline) or "auto" (fastest per language).
+# TTS_EDGE_ENDPOINT replaces the edge-tts service URL (e.g. a local fake server)
+TTS_BACKEND = "edge"
+TTS_EDGE_ENDPOINT = None
+
+# Long recordings are transcribed in windows of UA_CHUNK_SECONDS (plus overlap on both
+# sides), so memory use doesn't grow with audio length
+UA_CHUNK_SECONDS = 20
+UA_CHUNK_OVERLAP_SECONDS = 2
+
+# Inference engine on CPU: "fp32", "int8" (dynamic quantization) or "onnx" (ONNX Runtime,
+# Ukrainian STT only). GPU always uses fp32. CPU_THREADS=None keeps the library default
+CPU_ENGINE = "int8"
+# Language ID stays fp32 on CPU until benchmarks.inference shows int8 is as accurate
+LID_CPU_ENGINE = "fp32"
+CPU_THREADS = None
+
+# Language ID decides between Ukrainian-family and English using only these languages.
+# The first LID_EARLY_EXIT_MS of audio are scored first, the whole utterance only if
+# the verdict there is less confident than LID_CONFIDENCE
+LID_LANGUAGES = ("uk", "pl", "ru", "be", "en")
+LID_UA_FAMILY = ("uk", "pl", "ru", "be")
+LID_EARLY_EXIT_MS = 1000
+LID_CONFIDENCE = 0.9
+
+# Run language ID and both recognizers at the same time and keep the transcript that
+# matches the detected language (faster, but uses more CPU/GPU). Disable on weak machines
+SPECULATIVE_STT = True
+
+# Prompt sent to the LLM is kept under this many tokens: system prompt is pinned,
+# older turns are summarized (or dropped if CONTEXT_SUMMARIZE is False)
+CONTEXT_TOKEN_BUDGET = 6144
+CONTEXT_SUMMARIZE = True
+# Print prompt size (messages, estimated tokens) for every request
+CONTEXT_REPORT = False
+
+# Conversation history (main.py): one JSONL file per session, last HISTORY_LOAD_MESSAGES
+# are loaded at startup. A file with more than HISTORY_MAX_RECORDS records is compacted
+# in the background to the newest half of them (older ones go to a gzipped archive)
+HISTORY_DIR = "./data/history"
+HISTORY_LOAD_MESSAGES = 50
+HISTORY_MAX_RECORDS = 1000
+
+# Answer cache: repeated questions (same prompt, model, system prompt, conversation summary
+# and the last ANSWER_CACHE_CONTEXT_MESSAGES messages before the prompt) replay the stored
+# answer instead of generating. 1 keys on the previous answer, so follow-ups ("why?",
+# "and in Ukrainian?") aren't answered with a reply given after another question.
+# Answers expire after ANSWER_CACHE_TTL_S, at most ANSWER_CACHE_MAX_ENTRIES are kept
+ANSWER_CACHE = False
+ANSWER_CACHE_TTL_S = 24 * 60 * 60
+ANSWER_CACHE_MAX_ENTRIES = 512
+ANSWER_CACHE_CONTEXT_MESSAGES = 1
+
+# Ollama: server (None - OLLAMA_HOST env or localhost), how long the model stays loaded
+# after a request, and generation options (None values are left to Ollama)
+OLLAMA_HOST = None
+OLLAMA_MODEL = "llama3.1"
+OLLAMA_KEEP_ALIVE = "30m"
+OLLAMA_OPTIONS = {"num_ctx": 8192, "num_thread": None}
+
+# Turn engine (main.py): keep listening while the assistant speaks and stop the answer
+# when the user starts talking. Speech must be BARGE_IN_THRESHOLD_RATIO times louder
+# than the calibrated threshold to count, so the assistant's own voice doesn't trigger it
+BARGE_IN = True
+BARGE_IN_THRESHOLD_RATIO = 2.0
+
+# LLM answers are spoken in segments of at least SEGMENT_MIN_CHARS characters (shorter
+# sentences are joined with the next one) and at most SEGMENT_MAX_CHARS
+SEGMENT_MIN_CHARS = 16
+SEGMENT_MAX_CHARS = 200
+
+# Latency tracing: spans of every stage (STT, LLM, TTS...) are written per turn to
+# TRACE_FILE (JSONL), summary: python -m src.tracing. Costs almost nothing when off
+TRACE = False
+TRACE_FILE = "./data/traces.jsonl"
+
+# Google speech recognizer URL (None - the library default), e.g. a local fake server
+GOOGLE_STT_ENDPOINT = None
+
+# Voice server (server.py): many sessions over WebSocket, local connections only.
+# STT and language ID requests of all sessions are micro-batched: up to
+# SCHEDULER_MAX_BATCH per forward pass, waiting at most SCHEDULER_MAX_WAIT_MS for a batch
+# to fill. New requests wait while SCHEDULER_MAX_QUEUE are queued; a session with
+# SCHEDULER_MAX_PENDING requests in flight is told it's busy
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SCHEDULER_MAX_BATCH = 8
+SCHEDULER_MAX_WAIT_MS = 20
+SCHEDULER_MAX_QUEUE = 64
+SCHEDULER_MAX_PENDING = 2
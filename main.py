@@ -2,106 +2,63 @@
 in UA and EN voices. With this configuration it can be used for studying english or ukrainian, \
 both writing and listening skills"""
 
-import json
-import sounddevice  # fixing ALSA errors
-import speech_recognition as sr
-from src.english_stt import en_transcribe
-from src.identify_lang import identify_language
-from src.ollama_tts import ollama_prompt
-from src.ukrainian_stt import ua_transcribe
-from config import SYS_MSG
+import argparse
+import asyncio
+from src.context import ContextManager
+from src.history_store import HistoryStore
+from src.llm_client import warm_up_in_background
+from src.model_registry import warm_up_models_in_background
+from src.tracing import TRACER, format_summary
+from src.turn_engine import TurnEngine
+from config import HISTORY_LOAD_MESSAGES, SYS_MSG, WARM_START
 
 
-def main(memory=False):
+def main(memory=False, warm_start=WARM_START, session="default"):
     """
     The main entry point for the application.
 
     Args:
         memory (bool, optional): Whether to load and save conversation history. Defaults to False.
+        warm_start (bool, optional): Load STT/LID models in the background right away, so\
+            the first request is served as fast as later ones. Defaults to WARM_START.
+        session (str, optional): Name of the conversation to continue. Defaults to "default".
 
     Returns:
         None
 
     Automatically detect your language, transcribe it and pronounce & write the answer in UA & EN.
-    Optionally save conversation history to a JSON file
+    Optionally save conversation history, every message is appended as it happens
     """
+    history = [{"role": "system", "content": SYS_MSG}]
+    store = None
     if memory is True:
-        try:
-            with open("data/HISTORY.json", "r", encoding="UTF-8") as f:
-                history = json.load(f)
-        except FileNotFoundError:
+        store = HistoryStore(session=session)
+        store.import_json("data/HISTORY.json")  # history saved by older versions
+        previous = store.tail(HISTORY_LOAD_MESSAGES)
+        if not previous:
             print(
                 "No previous history is available, creating new one.",
                 "\t",
                 "Попередньої розмови не знайдено, створюю розмову.",
             )
-            history = [{"role": "system", "content": SYS_MSG}]
+        history += previous
+    if warm_start is True:
+        # LLM, STT/LID models and TTS load while the microphone is calibrated
+        warm_up_in_background()
+        warm_up_models_in_background()
+    context = ContextManager()
     try:
-        listening = True
-        while listening:
-            with sr.Microphone() as source:
-                recognizer = sr.Recognizer()
-                recognizer.pause_threshold = 0.8
-                recognizer.energy_threshold = 500
-                recognizer.adjust_for_ambient_noise(source)  # , duration=1)
-                # recognizer.dynamic_energy_threshold = 3000
-
-                def_lang = "???"
-                try:
-                    print("Listening...\t\t Слухаю...")
-                    audio = recognizer.listen(source, timeout=5.0)
-                    print("Working on it...\t Обробка...")
-                    # Save the audio data to a WAV file
-                    wav_data = audio.get_wav_data(convert_rate=16000)
-                    # Write the WAV data to a file
-                    wav_file = "./data/wav/chunk.wav"
-                    with open(wav_file, "wb") as file:
-                        file.write(wav_data)
-                except sr.UnknownValueError:
-                    print(
-                        "Could you repeat please?.It's not recognized",
-                        "\t\t",
-                        "Повторіть будь ласка, не розчула",
-                    )
-                def_lang = identify_language(wav_file)
-                if def_lang in [
-                    ["uk: Ukrainian"],
-                    ["pl: Polish"],
-                    ["ru: Russian"],
-                    ["be: Belarusian"],
-                ]:
-                    print("Запит Солов'їною, обробка...")
-                    prmpt = ua_transcribe(wav_file)
-                    print("Користувач:", prmpt)
-                    print("Дай подумати...")
-                    ollama_prompt(prompt="ua: " + prmpt, history=history)
-                else:
-                    print("Detected as english, working on it...")
-                    prmpt = en_transcribe(wav_file)
-                    if prmpt == "Didn't recognize that.":
-                        print("Didn't recognize that.\t\t Не зрозуміла.")
-                    else:
-                        print("User:", prmpt)
-                        print("Wait for LLM to answer... Зараз відповім...")
-                        ollama_prompt(prompt="en: " + prmpt, history=history)
-                    print("\n", "\n")
-
+        # Capture, recognition and answering run concurrently, the user can interrupt
+        asyncio.run(TurnEngine(history, context=context, store=store).run())
     except KeyboardInterrupt:
-        listening = False
         print("\n", "Stopped listening.\t Перервано.")
         print("\n", "\n")
         print("HISTORY:", history)
-        # Also we can save history to reuse it later
-        # Specify the file path and name
-        history_path = "./data/HISTORY.json"
-
-        # Serialize the list to JSON
-        json_data = json.dumps(history)
-
-        # Write the JSON data to the file
-        with open(history_path, "w", encoding="utf-8") as file:
-            file.write(json_data)
+        if TRACER.turns:
+            print("\n" + format_summary(TRACER.turns))
 
 
 if __name__ == "__main__":
-    main(memory=True)
+    parser = argparse.ArgumentParser(description="Console voice assistant (UA/EN).")
+    parser.add_argument("--session", default="default", help="conversation to continue")
+    main(memory=True, session=parser.parse_args().session)
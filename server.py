@@ -0,0 +1,284 @@
+"""Voice server: many learners talk to the assistant at the same time
+
+Every WebSocket connection to /ws is a session with its own conversation history and
+context; speech recognition and language ID of all sessions share one set of models
+through the InferenceScheduler, which micro-batches their requests. Only connections
+from this machine are accepted.
+
+Protocol (JSON text messages unless noted):
+  client -> server
+    binary                        a WAV recording of one utterance
+    {"type": "text", "text": ...} a typed prompt
+    {"type": "cancel"}            stop the current answer
+  server -> client
+    {"type": "transcript", "lang": "ua"|"en", "text": ...}
+    {"type": "token", "text": ...}                  LLM answer as it's generated
+    {"type": "sentence", "text": ..., "lang": ...}  followed by one binary message, its audio
+    {"type": "done", "text": ...}                   the whole answer
+    {"type": "busy"} / {"type": "error", "message": ...}
+A new utterance or prompt stops the answer still in progress.
+GET /stats returns the number of sessions and the scheduler queues.
+
+Usage:
+    python server.py [--host 127.0.0.1] [--port 8765]
+"""
+
+import argparse
+import asyncio
+import ipaddress
+import threading
+import uuid
+
+from aiohttp import WSMsgType, web
+from src.audio import load_recording
+from src.context import ContextManager
+from src.llm_client import chat_stream, warm_up_in_background
+from src.model_registry import warm_up_models_in_background
+from src.scheduler import InferenceScheduler, SchedulerBusy
+from src.segmenter import SentenceSegmenter
+from src.utils import check_language
+from config import OLLAMA_MODEL, SERVER_HOST, SERVER_PORT, SYS_MSG, WARM_START
+
+
+class Session:
+    """One connected learner: conversation, context and the answer in progress.
+
+    Args:
+        ws (web.WebSocketResponse): The connection.
+        scheduler (InferenceScheduler): Shared speech recognition.
+        model (str, optional): The Ollama model to use. Defaults to OLLAMA_MODEL.
+    """
+
+    def __init__(self, ws: web.WebSocketResponse, scheduler: InferenceScheduler, model=OLLAMA_MODEL):
+        self.id = uuid.uuid4().hex[:8]
+        self.ws = ws
+        self.scheduler = scheduler
+        self.model = model
+        self.history = [{"role": "system", "content": SYS_MSG}]
+        self.context = ContextManager()
+        self._task = None
+        self._stop_answer = threading.Event()
+        self._send_lock = asyncio.Lock()  # a sentence and its audio go out together
+        self._context_lock = asyncio.Lock()  # one context build per session at a time
+        self._building = None  # the last context build, it may outlive a cancelled turn
+
+    async def send(self, event: dict, audio: bytes = None) -> None:
+        """Sends an event (and the audio that belongs to it) unless the client is gone."""
+        async with self._send_lock:
+            if self.ws.closed:
+                return
+            await self.ws.send_json(event)
+            if audio is not None:
+                await self.ws.send_bytes(audio)
+
+    def start(self, coroutine) -> None:
+        """Runs a new turn, stopping the one in progress."""
+        self.cancel()
+        self._stop_answer = threading.Event()
+        self._task = asyncio.ensure_future(coroutine)
+
+    def cancel(self) -> None:
+        """Stops the current turn; the part of the answer generated so far is kept."""
+        self._stop_answer.set()
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def on_audio(self, data: bytes) -> None:
+        """Recognizes an utterance and answers it."""
+        try:
+            # Any rate and channels, silence trimmed; off the loop, other sessions keep going
+            audio = await asyncio.get_running_loop().run_in_executor(None, load_recording, data)
+            lang, text = await self.scheduler.transcribe_auto(self.id, audio)
+        except SchedulerBusy:
+            await self.send({"type": "busy"})
+            return
+        except ValueError as e:  # not a WAV file we can decode
+            await self.send({"type": "error", "message": str(e)})
+            return
+        except Exception as e:  # pylint: disable=broad-except
+            await self.send({"type": "error", "message": f"could not recognize speech; {e}"})
+            return
+        await self.send({"type": "transcript", "lang": lang, "text": text})
+        if lang == "en" and text == "Didn't recognize that.":
+            return
+        await self.answer(f"{lang}: {text}")
+
+    async def on_text(self, text: str) -> None:
+        """Answers a typed prompt."""
+        await self.answer(check_language(user_prompt=text))
+
+    async def answer(self, prompt: str) -> None:
+        """Streams the LLM answer as tokens, and as sentences with their audio."""
+        from src.transcribe_speak import synthesize  # pylint: disable=import-outside-toplevel
+
+        loop = asyncio.get_running_loop()
+        tokens, stop = asyncio.Queue(), self._stop_answer
+        async with self._context_lock:
+            # Cancelling a turn doesn't stop its build thread, which may still be summarizing
+            if self._building is not None:
+                await asyncio.wait([self._building])
+            # Folding old turns may ask the LLM for a summary, so it runs off the loop as well;
+            # the prompt joins the history only once the build is done, so a turn cancelled
+            # meanwhile leaves no unanswered prompt behind
+            pending = self.history + [{"role": "user", "content": prompt}]
+            self._building = loop.run_in_executor(None, self.context.build, pending)
+            self._building.add_done_callback(lambda future: future.cancelled() or future.exception())
+            messages = await asyncio.shield(self._building)
+            self.history.append(pending[-1])
+
+        def generate():
+            try:
+                stream = chat_stream(messages=messages, model=self.model)
+                try:
+                    for chunk in stream:
+                        if stop.is_set():
+                            break
+                        loop.call_soon_threadsafe(tokens.put_nowait, chunk["message"]["content"])
+                finally:
+                    stream.close()  # drops the HTTP response, Ollama stops generating
+            finally:
+                loop.call_soon_threadsafe(tokens.put_nowait, None)
+
+        # Sentences are synthesized as soon as they're complete and sent in order
+        sentences = asyncio.Queue()
+
+        async def speak():
+            while True:
+                item = await sentences.get()
+                if item is None:
+                    return
+                text, lang, audio = item
+                await self.send({"type": "sentence", "text": text, "lang": lang}, await audio)
+
+        def synthesis(text, lang):
+            audio = asyncio.ensure_future(synthesize(text, lang))
+            pending.append(audio)
+            sentences.put_nowait((text, lang, audio))
+
+        pending = []
+        generation = loop.run_in_executor(None, generate)
+        speaker = asyncio.ensure_future(speak())
+        segmenter, answer = SentenceSegmenter(), {"role": "assistant", "content": ""}
+        self.history.append(answer)
+        try:
+            while True:
+                token = await tokens.get()
+                if token is None:
+                    break
+                answer["content"] += token
+                await self.send({"type": "token", "text": token})
+                for text, lang in segmenter.feed(token):
+                    synthesis(text, lang)
+            for text, lang in segmenter.flush():
+                synthesis(text, lang)
+            sentences.put_nowait(None)
+            await speaker
+            await generation
+            await self.send({"type": "done", "text": answer["content"]})
+        except asyncio.CancelledError:
+            stop.set()
+            raise
+        except Exception as e:  # pylint: disable=broad-except
+            stop.set()
+            await self.send({"type": "error", "message": str(e)})
+        finally:
+            speaker.cancel()
+            for audio in pending:
+                audio.cancel()
+
+
+def local_only(request: web.Request) -> None:
+    """Refuses connections from other machines."""
+    remote = request.remote or ""
+    try:
+        loopback = ipaddress.ip_address(remote).is_loopback
+    except ValueError:
+        loopback = remote == "localhost"
+    if not loopback:
+        raise web.HTTPForbidden(text="local connections only")
+
+
+async def websocket_handler(request: web.Request) -> web.WebSocketResponse:
+    """One session per connection, alive until the client disconnects."""
+    local_only(request)
+    ws = web.WebSocketResponse(max_msg_size=16 * 1024 * 1024)
+    await ws.prepare(request)
+    session = Session(ws, request.app["scheduler"])
+    request.app["sessions"].add(session)
+    try:
+        async for message in ws:
+            if message.type == WSMsgType.BINARY:
+                session.start(session.on_audio(message.data))
+            elif message.type == WSMsgType.TEXT:
+                try:
+                    event = message.json()
+                except ValueError:
+                    await session.send({"type": "error", "message": "not JSON"})
+                    continue
+                if event.get("type") == "cancel":
+                    session.cancel()
+                elif event.get("type") == "text" and event.get("text"):
+                    session.start(session.on_text(event["text"]))
+                else:
+                    await session.send({"type": "error", "message": "unknown message"})
+    finally:
+        session.cancel()
+        request.app["sessions"].discard(session)
+    return ws
+
+
+async def stats_handler(request: web.Request) -> web.Response:
+    """Sessions connected and scheduler queues, as JSON."""
+    local_only(request)
+    return web.json_response(
+        {"sessions": len(request.app["sessions"]), "scheduler": request.app["scheduler"].stats()}
+    )
+
+
+def create_app(scheduler: InferenceScheduler = None) -> web.Application:
+    """Creates the server application.
+
+    Args:
+        scheduler (InferenceScheduler, optional): Shared speech recognition. Defaults to\
+            one with the settings from config.
+    """
+    app = web.Application()
+    app["scheduler"] = scheduler or InferenceScheduler()
+    app["sessions"] = set()
+
+    async def start_scheduler(app):
+        await app["scheduler"].start()
+
+    async def stop_scheduler(app):
+        for session in list(app["sessions"]):
+            session.cancel()
+        await app["scheduler"].stop()
+
+    app.on_startup.append(start_scheduler)
+    app.on_cleanup.append(stop_scheduler)
+    app.router.add_get("/ws", websocket_handler)
+    app.router.add_get("/stats", stats_handler)
+    return app
+
+
+def main(host=SERVER_HOST, port=SERVER_PORT, warm_start=WARM_START):
+    """Serves until interrupted.
+
+    Args:
+        host (str, optional): Address to listen on. Defaults to SERVER_HOST.
+        port (int, optional): Defaults to SERVER_PORT.
+        warm_start (bool, optional): Load the models before the first learner connects.\
+            Defaults to WARM_START.
+    """
+    if warm_start is True:
+        warm_up_in_background()
+        warm_up_models_in_background()
+    web.run_app(create_app(), host=host, port=port)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Voice assistant server for many sessions.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    args = parser.parse_args()
+    main(host=args.host, port=args.port)
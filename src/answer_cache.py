@@ -0,0 +1,157 @@
+"""Cache of whole LLM answers for repeated questions
+
+Learners often ask the same thing ("How do you say apple?", menu questions). An answer
+is keyed by the normalized prompt (with its "ua:"/"en:" prefix), the model and a hash
+of the context it was answered in: the system messages (prompt and conversation summary)
+and the last ANSWER_CACHE_CONTEXT_MESSAGES messages before the prompt. By default that's
+the previous answer, so a follow-up ("why?", "and in Ukrainian?") is only replayed after
+the same answer, at the cost of fewer hits for questions asked at different points of a
+conversation. Only answers that were generated to the end are stored.
+Entries expire after ANSWER_CACHE_TTL_S and the least recently used are evicted above
+ANSWER_CACHE_MAX_ENTRIES.
+
+A hit is replayed as a stream of chunks shaped like Ollama's, so it goes through the same
+sentence splitting and speech as a generated answer, just without waiting for the model.
+The cache lives in memory and is shared by all sessions of the process.
+"""
+
+import hashlib
+import json
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+sys.path.append("./")
+from config import ANSWER_CACHE_CONTEXT_MESSAGES, ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_S
+
+_PREFIX = re.compile(r"^(ua|en)\s*:\s*")
+_TRAILING_PUNCTUATION = re.compile(r"[\s.!?,;:]+$")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Returns the prompt in a form that ignores case, spacing and final punctuation.
+
+    The language prefix is kept ("ua:" and "en: " become "ua: "), since it changes the answer.
+    """
+    prompt = " ".join(prompt.split()).casefold()
+    prompt = _PREFIX.sub(r"\1: ", prompt)
+    return _TRAILING_PUNCTUATION.sub("", prompt)
+
+
+class AnswerCache:
+    """In-memory LRU cache of answers with a time to live.
+
+    Args:
+        max_entries (int, optional): Answers kept. Defaults to ANSWER_CACHE_MAX_ENTRIES.
+        ttl (float, optional): Seconds an answer stays valid. Defaults to ANSWER_CACHE_TTL_S.
+        context_messages (int, optional): Messages before the prompt that are part of the key.
+            Defaults to ANSWER_CACHE_CONTEXT_MESSAGES.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl=ANSWER_CACHE_TTL_S,
+                 context_messages=ANSWER_CACHE_CONTEXT_MESSAGES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.context_messages = context_messages
+        self.hits = 0
+        self.misses = 0
+        self._answers = OrderedDict()  # key -> (time stored, answer text)
+        self._lock = threading.Lock()
+
+    def key(self, messages: list, model: str):
+        """Returns the cache key of the last (user) message in its context, None if uncacheable."""
+        if not messages or messages[-1]["role"] != "user":
+            return None
+        earlier = messages[:-1]
+        system = [message for message in earlier if message["role"] == "system"]
+        turns = [message for message in earlier if message["role"] != "system"]
+        recent = turns[len(turns) - self.context_messages:] if self.context_messages else []
+        context = json.dumps(
+            [[message["role"], message["content"]] for message in system + recent], ensure_ascii=False
+        )
+        context_hash = hashlib.sha256(context.encode("utf-8")).hexdigest()
+        return model, context_hash, normalize_prompt(messages[-1]["content"])
+
+    def get(self, key):
+        """Returns the cached answer, or None on a miss (or an expired entry)."""
+        with self._lock:
+            entry = self._answers.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._answers[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._answers.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, answer: str) -> None:
+        """Stores an answer, evicting the least recently used ones above max_entries."""
+        if key is None or not answer.strip():
+            return
+        with self._lock:
+            self._answers[key] = (time.monotonic(), answer)
+            self._answers.move_to_end(key)
+            while len(self._answers) > self.max_entries:
+                self._answers.popitem(last=False)
+
+    def record(self, stream, key):
+        """Passes an LLM stream through and stores the answer if it was read to the end."""
+        answer = []
+        try:
+            for chunk in stream:
+                answer.append(chunk["message"]["content"])
+                yield chunk
+        finally:
+            stream.close()
+        self.put(key, "".join(answer))
+
+    def clear(self) -> None:
+        """Removes every cached answer."""
+        with self._lock:
+            self._answers.clear()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and the number of answers kept."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._answers),
+            }
+
+
+def replay(answer: str, model: str):
+    """Yields a cached answer as Ollama-like stream chunks, a word at a time."""
+    for piece in re.findall(r"\s*\S+\s*", answer) or [answer]:
+        yield {"model": model, "message": {"role": "assistant", "content": piece}, "done": False}
+    yield {"model": model, "message": {"role": "assistant", "content": ""}, "done": True}
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Returns the process-wide answer cache."""
+    global _CACHE  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = AnswerCache()
+        return _CACHE
+
+
+if __name__ == "__main__":
+    cache = AnswerCache()
+    question = [{"role": "system", "content": "You are a tutor."}, {"role": "user", "content": "en: Apple?"}]
+    cache.put(cache.key(question, "llama3.1"), "Apple is яблуко. Anything else?")
+    same = question[:1] + [{"role": "user", "content": "EN:  apple"}]
+    start = time.perf_counter()
+    chunks = replay(cache.get(cache.key(same, "llama3.1")), "llama3.1")
+    text = "".join(chunk["message"]["content"] for chunk in chunks)
+    print(f"{text!r} in {(time.perf_counter() - start) * 1000:.2f} ms", cache.stats())
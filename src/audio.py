@@ -0,0 +1,239 @@
+"""In-memory audio helpers
+
+All speech models here work on 16 kHz mono float32 audio, so the pipeline passes
+NumPy arrays in that format between stages instead of writing and re-reading WAV files.
+Recordings (WAV bytes from the browser or a client) go through load_recording(): the
+samples are decoded straight from the bytes, downmixed, trimmed and resampled with
+vectorized NumPy, with no temporary files.
+"""
+
+import math
+import struct
+import sys
+from functools import lru_cache
+
+import numpy as np
+import soundfile as sf
+
+sys.path.append("./")
+from config import AUDIO_TRIM_DB, AUDIO_TRIM_PAD_MS, AUDIO_TRIM_SILENCE
+
+SAMPLE_RATE = 16000
+_PCM, _FLOAT, _EXTENSIBLE = 1, 3, 0xFFFE
+
+
+def read_audio(source) -> np.ndarray:
+    """Returns audio as a mono float32 array.
+
+    Args:
+        source: Path to an audio file, or an array that is already 16 kHz mono audio.
+
+    Returns:
+        np.ndarray: Mono float32 samples. Arrays that are already float32 are not copied.
+    """
+    if isinstance(source, np.ndarray):
+        audio = np.asarray(source, dtype=np.float32)
+    else:
+        audio, _ = sf.read(source, dtype="float32")
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1, dtype=np.float32)
+    return audio
+
+
+def _wav_frames(data: bytes) -> tuple:
+    """Finds the samples in WAV bytes (8/16/24/32-bit PCM or 32/64-bit float) without
+    converting them.
+
+    Returns:
+        tuple: (array of shape (frames, channels), a view of `data` where the format allows,
+            scale and offset to [-1, 1] as (x - offset) * scale, sampling rate)
+
+    Raises:
+        ValueError: If the data isn't a WAV file in one of those formats.
+    """
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("not a WAV file")
+    offset, fmt = 12, None
+    while offset + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, offset)
+        body = offset + 8
+        if chunk_id == b"fmt ":
+            if size < 16 or body + 16 > len(data):
+                raise ValueError("WAV file with a truncated format chunk")
+            fmt = struct.unpack_from("<HHIIHH", data, body)
+            if fmt[0] == _EXTENSIBLE and size >= 40 and body + 26 <= len(data):
+                # The real format is the first two bytes of the sub-format GUID
+                fmt = (struct.unpack_from("<H", data, body + 24)[0],) + fmt[1:]
+        elif chunk_id == b"data":
+            if fmt is None:
+                break
+            # Browsers streaming a recording may leave the size at 0 or 0xFFFFFFFF
+            end = len(data) if size in (0, 0xFFFFFFFF) else min(body + size, len(data))
+            return _samples(memoryview(data)[body:end], fmt)
+        offset = body + size + (size & 1)  # chunks are padded to an even size
+    raise ValueError("WAV file without format or data chunk")
+
+
+def _samples(data: memoryview, fmt: tuple) -> tuple:
+    tag, channels, rate, _, _, bits = fmt
+    width = bits // 8
+    if not channels or not width or rate <= 0:
+        raise ValueError("WAV file with no channels, empty samples or no sampling rate")
+    data = data[: len(data) - len(data) % (width * channels)]  # drop a truncated last frame
+    if tag == _FLOAT and bits in (32, 64):
+        samples, scale, offset = np.frombuffer(data, dtype=f"<f{width}"), 1.0, 0.0
+    elif tag == _PCM and bits == 8:
+        samples, scale, offset = np.frombuffer(data, dtype=np.uint8), 1 / 128, 128.0
+    elif tag == _PCM and bits in (16, 32):
+        samples, scale, offset = np.frombuffer(data, dtype=f"<i{width}"), 1 / 2 ** (bits - 1), 0.0
+    elif tag == _PCM and bits == 24:
+        # Three bytes per sample: put them in the top of an int32, whose top byte keeps the sign
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        wide = np.zeros((len(raw), 4), dtype=np.uint8)
+        wide[:, 1:] = raw
+        samples, scale, offset = wide.view("<i4").ravel(), 1 / 2 ** 31, 0.0
+    else:
+        raise ValueError(f"unsupported WAV format {tag} with {bits} bits per sample")
+    return samples.reshape(-1, channels), scale, offset, rate
+
+
+@lru_cache(maxsize=16)
+def _polyphase_filter(up: int, down: int, taps=32, beta=8.0) -> np.ndarray:
+    """Kaiser-windowed sinc low-pass filter split into `up` phases.
+
+    Row p holds the weights of the input samples around output p (and every up-th output
+    after it), whose position falls p * down % up / up of a sample after an input sample.
+    The filter spans `taps` output samples and cuts off just below the lower Nyquist limit.
+    """
+    ratio = max(1.0, down / up)
+    width = int(math.ceil(taps * ratio))
+    width += width % 2
+    cutoff = 0.95 * 0.5 / ratio  # cycles per input sample
+    fraction = np.arange(up) * down % up / up
+    distance = fraction[:, None] + width // 2 - 1 - np.arange(width)[None, :]
+    window = np.i0(beta * np.sqrt(np.clip(1 - (2 * distance / width) ** 2, 0, None))) / np.i0(beta)
+    weights = np.sinc(2 * cutoff * distance) * window
+    return (weights / weights.sum(axis=1, keepdims=True)).astype(np.float32)  # unity gain
+
+
+def resample(audio: np.ndarray, rate: int, target=SAMPLE_RATE, block=2 ** 17) -> np.ndarray:
+    """Resamples mono audio with a polyphase low-pass filter (no aliasing when downsampling).
+
+    Only the output samples are computed, as matrix-vector products over strided views of
+    the input (no upsampled intermediate), `block` outputs at a time so the input they
+    read stays in the CPU cache.
+
+    Args:
+        audio (np.ndarray): Mono float32 samples.
+        rate (int): Their sampling rate.
+        target (int, optional): Wanted sampling rate. Defaults to 16000.
+        block (int, optional): Outputs computed per pass. Defaults to 2 ** 17 (about 8 s).
+
+    Returns:
+        np.ndarray: float32 samples at `target` (the input itself if the rates match).
+    """
+    if rate == target or not len(audio):
+        return audio
+    common = math.gcd(rate, target)
+    up, down = target // common, rate // common
+    weights = _polyphase_filter(up, down)
+    width = weights.shape[1]
+    outputs = len(audio) * up // down
+    out = np.empty(outputs, dtype=np.float32)
+    # Zeros before and after, so the first and last outputs have a full window
+    padded = np.zeros(len(audio) + width + 2 * down, dtype=np.float32)
+    padded[width // 2 - 1: width // 2 - 1 + len(audio)] = audio
+    # Overlapping windows (down < width) are cut in frames of `down` samples instead, so
+    # every product reads contiguous rows; output i of a phase needs frames i..i+parts-1
+    framed = 2 <= down <= width
+    if framed:
+        parts = -(-width // down) + 1
+        frames = padded[: len(padded) // down * down].reshape(-1, down)
+        kernels = np.zeros((up, parts * down), dtype=np.float32)
+        for phase in range(up):
+            shift = phase * down // up
+            kernels[phase, shift: shift + width] = weights[phase]
+        kernels = kernels.reshape(up, parts, down)
+    else:
+        windows = np.lib.stride_tricks.sliding_window_view(padded, width)
+
+    step = max(1, block // up) * up  # whole periods of the phase pattern
+    for begin in range(0, outputs, step):
+        stop = min(outputs, begin + step)
+        first = begin // up * down  # input sample under output `begin`
+        for phase in range(min(up, stop - begin)):
+            count = len(range(begin + phase, stop, up))
+            if framed:
+                row = first // down
+                result = frames[row: row + count] @ kernels[phase, 0]
+                for part in range(1, parts):
+                    result += frames[row + part: row + part + count] @ kernels[phase, part]
+            else:
+                result = windows[first + phase * down // up:: down][:count] @ weights[phase]
+            out[begin + phase: stop: up] = result
+    return out
+
+
+def trim_silence(audio: np.ndarray, sampling_rate=SAMPLE_RATE, threshold_db=AUDIO_TRIM_DB,
+                 pad_ms=AUDIO_TRIM_PAD_MS, frame_ms=10) -> np.ndarray:
+    """Cuts leading and trailing silence, keeping `pad_ms` around the speech.
+
+    Args:
+        audio (np.ndarray): Mono float32 samples.
+        sampling_rate (int, optional): Defaults to 16000.
+        threshold_db (float, optional): Frames more than this quieter than the loudest one
+            are silence. Only this relative level is used, so quiet speech recorded with a
+            low microphone gain is kept. Defaults to AUDIO_TRIM_DB.
+        pad_ms (int, optional): Audio kept before and after the speech. Defaults to AUDIO_TRIM_PAD_MS.
+        frame_ms (int, optional): Frame length for the energy. Defaults to 10.
+
+    Returns:
+        np.ndarray: A view of the speech part of `audio`, all of it if it's digital silence.
+    """
+    frame = max(1, sampling_rate * frame_ms // 1000)
+    frames = audio[: len(audio) // frame * frame].reshape(-1, frame)
+    if not len(frames):
+        return audio
+    energy = np.sqrt(np.mean(np.square(frames), axis=1))
+    peak = float(energy.max())
+    if not peak:
+        return audio
+    speech = np.flatnonzero(energy >= peak * 10 ** (-threshold_db / 20))
+    pad = sampling_rate * pad_ms // 1000
+    start = max(0, speech[0] * frame - pad)
+    end = min(len(audio), (speech[-1] + 1) * frame + pad)
+    return audio[start:end]
+
+
+def load_recording(data: bytes, trim=AUDIO_TRIM_SILENCE) -> np.ndarray:
+    """Turns a WAV recording into what the recognizers take: 16 kHz mono float32.
+
+    Args:
+        data (bytes): Contents of a WAV file, any sampling rate and number of channels.
+        trim (bool, optional): Cut leading/trailing silence. Defaults to AUDIO_TRIM_SILENCE.
+
+    Raises:
+        ValueError: If the data isn't a supported WAV file.
+    """
+    frames, scale, offset, rate = _wav_frames(data)
+    # Channels are summed straight from the raw samples: one float32 copy, already mono
+    audio = frames[:, 0].astype(np.float32)
+    for channel in range(1, frames.shape[1]):
+        audio += frames[:, channel]
+    if offset:
+        audio -= offset * frames.shape[1]
+    audio *= scale / frames.shape[1]
+    if trim:
+        # Trimmed first, so only the speech is resampled
+        audio = trim_silence(audio, sampling_rate=rate)
+    return resample(audio, rate)
+
+
+def to_pcm16_bytes(audio: np.ndarray) -> bytes:
+    """Converts float32 samples in [-1, 1] to raw little-endian 16-bit PCM."""
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+
+def duration(audio: np.ndarray, sampling_rate=SAMPLE_RATE) -> float:
+    """Returns duration of the audio in seconds."""
+    return len(audio) / sampling_rate
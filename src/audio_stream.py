@@ -0,0 +1,201 @@
+"""Streaming microphone capture with an energy-based voice activity detector
+
+The microphone stays open and pushes 16 kHz mono float32 blocks into a queue from the
+audio callback, while EnergyVAD cuts the stream into utterances as soon as the speaker
+pauses. Utterances are NumPy arrays that go straight to language ID and STT.
+"""
+
+import queue
+from collections import deque
+
+import numpy as np
+import sounddevice as sd
+
+from src.audio import SAMPLE_RATE
+from config import VAD_ENERGY_FLOOR, VAD_PAUSE_MS
+
+
+class EnergyVAD:
+    """Splits a stream of audio blocks into utterances using short-term RMS energy.
+
+    Args:
+        sampling_rate (int, optional): Sample rate of the stream. Defaults to 16000.
+        frame_ms (int, optional): Analysis frame length. Defaults to 30 ms.
+        pause_ms (int, optional): Silence that ends an utterance. Defaults to VAD_PAUSE_MS.
+        min_speech_ms (int, optional): Shorter bursts (clicks, coughs) are dropped.
+        pre_roll_ms (int, optional): Audio kept before speech onset, so first syllables
+            aren't cut off. Defaults to 300 ms.
+        max_utterance_s (float, optional): Utterance is emitted once it gets this long.
+        energy_threshold (float, optional): RMS level of speech. Defaults to VAD_ENERGY_FLOOR,
+            raised by calibrate() in noisy rooms.
+        on_speech_start (callable, optional): Called (from the feeding thread) when an
+            utterance starts, e.g. to interrupt the assistant.
+    """
+
+    def __init__(
+        self,
+        sampling_rate=SAMPLE_RATE,
+        frame_ms=30,
+        pause_ms=VAD_PAUSE_MS,
+        min_speech_ms=250,
+        pre_roll_ms=300,
+        max_utterance_s=30.0,
+        energy_threshold=VAD_ENERGY_FLOOR,
+        on_speech_start=None,
+    ):
+        self.frame_len = sampling_rate * frame_ms // 1000
+        self.pause_frames = max(1, pause_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_frames = int(max_utterance_s * 1000 // frame_ms)
+        self.energy_threshold = energy_threshold
+        self.on_speech_start = on_speech_start
+        self._pre_roll = deque(maxlen=max(1, pre_roll_ms // frame_ms))
+        self._leftover = np.zeros(0, dtype=np.float32)
+        self._frames = []
+        self._speech_frames = 0
+        self._silent_frames = 0
+
+    @property
+    def in_speech(self) -> bool:
+        """True while an utterance is being collected."""
+        return bool(self._frames)
+
+    def calibrate(self, noise: np.ndarray, ratio=3.0) -> float:
+        """Sets the threshold above the ambient noise level (like adjust_for_ambient_noise).
+
+        Args:
+            noise (np.ndarray): A second or so of audio without speech.
+            ratio (float, optional): Speech must be this many times louder than noise.
+
+        Returns:
+            float: The new energy threshold.
+        """
+        rms = float(np.sqrt(np.mean(np.square(noise)))) if len(noise) else 0.0
+        self.energy_threshold = max(VAD_ENERGY_FLOOR, rms * ratio)
+        return self.energy_threshold
+
+    def reset(self) -> None:
+        """Drops any partially collected utterance."""
+        self._pre_roll.clear()
+        self._leftover = np.zeros(0, dtype=np.float32)
+        self._frames = []
+        self._speech_frames = 0
+        self._silent_frames = 0
+
+    def feed(self, block: np.ndarray) -> list:
+        """Consumes a block of samples.
+
+        Args:
+            block (np.ndarray): Mono float32 samples of any length.
+
+        Returns:
+            list: Utterances (np.ndarray) that ended within this block, usually empty.
+        """
+        if len(self._leftover):
+            block = np.concatenate((self._leftover, block))
+        n_frames = len(block) // self.frame_len
+        usable = n_frames * self.frame_len
+        self._leftover = block[usable:]
+        # Frames are views into the block, energy is computed for all of them at once
+        frames = block[:usable].reshape(n_frames, self.frame_len)
+        energy = np.sqrt(np.mean(np.square(frames), axis=1))
+
+        utterances = []
+        for frame, is_speech in zip(frames, energy > self.energy_threshold):
+            if not self._frames:
+                if is_speech:
+                    self._frames = list(self._pre_roll)
+                    self._pre_roll.clear()
+                    if self.on_speech_start is not None:
+                        self.on_speech_start()
+                else:
+                    self._pre_roll.append(frame)
+                    continue
+            self._frames.append(frame)
+            if is_speech:
+                self._speech_frames += 1
+                self._silent_frames = 0
+            else:
+                self._silent_frames += 1
+            if self._silent_frames >= self.pause_frames or len(self._frames) >= self.max_frames:
+                utterance = self._finish()
+                if utterance is not None:
+                    utterances.append(utterance)
+        return utterances
+
+    def _finish(self):
+        """Closes the current utterance, returns it or None if it was too short."""
+        frames, speech_frames = self._frames, self._speech_frames
+        self._frames, self._speech_frames, self._silent_frames = [], 0, 0
+        if speech_frames < self.min_speech_frames:
+            return None
+        return np.concatenate(frames)
+
+
+class MicrophoneStream:
+    """Long-lived microphone input delivering 16 kHz mono float32 blocks.
+
+    Args:
+        sampling_rate (int, optional): Capture rate. Defaults to 16000.
+        block_ms (int, optional): Callback block length. Defaults to 30 ms.
+        device (optional): sounddevice input device. Defaults to the system default.
+    """
+
+    def __init__(self, sampling_rate=SAMPLE_RATE, block_ms=30, device=None):
+        self.sampling_rate = sampling_rate
+        self._blocks = queue.Queue()
+        self._stream = sd.InputStream(
+            samplerate=sampling_rate,
+            channels=1,
+            dtype="float32",
+            blocksize=sampling_rate * block_ms // 1000,
+            device=device,
+            callback=self._callback,
+        )
+
+    def __enter__(self):
+        self._stream.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stream.stop()
+        self._stream.close()
+
+    def _callback(self, indata, frames, time_info, status):  # pylint: disable=unused-argument
+        # sounddevice reuses indata, so this is the only copy a block goes through
+        self._blocks.put(indata[:, 0].copy())
+
+    def read(self, timeout=None) -> np.ndarray:
+        """Returns the next captured block (raises queue.Empty on timeout)."""
+        return self._blocks.get(timeout=timeout)
+
+    def clear(self) -> None:
+        """Discards blocks captured so far (e.g. the assistant's own voice)."""
+        while True:
+            try:
+                self._blocks.get_nowait()
+            except queue.Empty:
+                return
+
+    def calibrate(self, vad: EnergyVAD, seconds=1.0) -> float:
+        """Listens to ambient noise for `seconds` and adjusts the VAD threshold."""
+        blocks, captured = [], 0
+        while captured < seconds * self.sampling_rate:
+            block = self.read()
+            blocks.append(block)
+            captured += len(block)
+        return vad.calibrate(np.concatenate(blocks))
+
+    def utterances(self, vad: EnergyVAD):
+        """Yields utterances (np.ndarray) as soon as the speaker pauses."""
+        while True:
+            for utterance in vad.feed(self.read()):
+                yield utterance
+
+
+if __name__ == "__main__":
+    detector = EnergyVAD()
+    with MicrophoneStream() as microphone:
+        print("Threshold:", microphone.calibrate(detector))
+        for speech in microphone.utterances(detector):
+            print(f"Utterance: {len(speech) / SAMPLE_RATE:.2f} s")
@@ -0,0 +1,172 @@
+"""Bulk Ukrainian transcription of audio archives
+
+Takes a directory of WAVs or a manifest, sorts the files by duration and groups them
+into length-bucketed batches (so little time is spent on padding), transcribes each
+batch in one forward pass and writes one JSON line per file.
+
+Usage:
+    python -m src.batch_transcribe data/lessons/ -o lessons.jsonl --threads 8
+    python -m src.batch_transcribe manifest.txt --batch-seconds 300 --device cpu
+
+Manifest is a text file with one path per line, or JSONL with a "path" field.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import soundfile as sf
+
+sys.path.append("./")
+from src.audio import SAMPLE_RATE
+from src.cpu_inference import set_cpu_threads
+from src.ukrainian_stt import UA_MODEL_NAME, ua_transcribe_batch
+
+
+def collect_files(source: str) -> list:
+    """Returns audio paths from a directory (searched recursively) or a manifest."""
+    if os.path.isdir(source):
+        return sorted(glob.glob(os.path.join(source, "**", "*.wav"), recursive=True))
+    paths = []
+    with open(source, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            paths.append(json.loads(line)["path"] if line.startswith("{") else line)
+    return paths
+
+
+def make_batches(durations: dict, batch_size=16, batch_seconds=120.0) -> list:
+    """Groups files of similar length together.
+
+    Args:
+        durations (dict): path -> duration in seconds.
+        batch_size (int, optional): Max files per batch. Defaults to 16.
+        batch_seconds (float, optional): Max padded audio per batch (longest file times
+            number of files), bounds memory use. Defaults to 120.
+
+    Returns:
+        list: Lists of paths.
+    """
+    batches, batch = [], []
+    for path in sorted(durations, key=durations.get):
+        # Sorted ascending, so the newest file is the longest one in the batch
+        padded = durations[path] * (len(batch) + 1)
+        if batch and (len(batch) >= batch_size or padded > batch_seconds):
+            batches.append(batch)
+            batch = []
+        batch.append(path)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def transcribe_files(paths, output, batch_size=16, batch_seconds=120.0, device="cpu",
+                     model_name=UA_MODEL_NAME, engine=None) -> dict:
+    """Transcribes files batch by batch, appending results to a JSONL file.
+
+    Args:
+        paths (list): Audio files (16 kHz).
+        output (str): JSONL file to write.
+        batch_size (int, optional): Max files per batch. Defaults to 16.
+        batch_seconds (float, optional): Max padded audio per batch. Defaults to 120.
+        device (str, optional): Device for computation. Defaults to "cpu".
+        model_name (str, optional): Pre-trained model name.
+        engine (str, optional): "fp32", "int8" or "onnx". Defaults to CPU_ENGINE on CPU.
+
+    A batch that fails is retried file by file, so one corrupt file only gets an "error"
+    record of its own and the run goes on.
+
+    Returns:
+        dict: files (transcribed), failed, audio_seconds, wall_seconds and rtf (real-time factor).
+    """
+    durations, failed = {}, 0
+    with open(output, "w", encoding="utf-8") as out:
+        for path in paths:
+            try:
+                info = sf.info(path)
+            except RuntimeError as e:
+                out.write(json.dumps({"path": path, "error": str(e)}, ensure_ascii=False) + "\n")
+                failed += 1
+                continue
+            if info.samplerate != SAMPLE_RATE:
+                error = f"sample rate {info.samplerate}, expected {SAMPLE_RATE}"
+                out.write(json.dumps({"path": path, "error": error}, ensure_ascii=False) + "\n")
+                failed += 1
+                continue
+            durations[path] = info.duration
+
+        def transcribe(batch):
+            return ua_transcribe_batch(batch, model_name=model_name, device=device, engine=engine)
+
+        start = time.perf_counter()
+        for number, batch in enumerate(make_batches(durations, batch_size, batch_seconds)):
+            batch_start = time.perf_counter()
+            try:
+                texts = transcribe(batch)
+            except Exception as e:  # pylint: disable=broad-except
+                print(f"Batch {number} failed ({e}), transcribing its files one by one")
+                texts = []
+                for path in batch:
+                    try:
+                        texts.extend(transcribe([path]))
+                    except Exception as file_error:  # pylint: disable=broad-except
+                        texts.append(file_error)
+            batch_time = time.perf_counter() - batch_start
+            batch_audio = sum(durations[path] for path in batch)
+            for path, text in zip(batch, texts):
+                if isinstance(text, Exception):
+                    out.write(json.dumps({"path": path, "error": str(text)}, ensure_ascii=False) + "\n")
+                    failed += 1
+                    continue
+                # Batch time is shared between files in proportion to their length
+                seconds = batch_time * durations[path] / batch_audio if batch_audio else 0.0
+                record = {
+                    "path": path,
+                    "text": text,
+                    "duration": round(durations[path], 3),
+                    "seconds": round(seconds, 3),
+                    "batch": number,
+                    "batch_seconds": round(batch_time, 3),
+                }
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"Batch {number}: {len(batch)} files, {batch_audio:.1f}s audio in {batch_time:.1f}s")
+
+    wall = time.perf_counter() - start
+    audio_seconds = sum(durations.values())
+    return {
+        "files": len(paths) - failed,
+        "failed": failed,
+        "audio_seconds": round(audio_seconds, 1),
+        "wall_seconds": round(wall, 1),
+        "rtf": round(wall / audio_seconds, 4) if audio_seconds else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe many Ukrainian WAV files.")
+    parser.add_argument("source", help="directory with .wav files or a manifest")
+    parser.add_argument("-o", "--output", default="transcripts.jsonl")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--batch-seconds", type=float, default=120.0)
+    parser.add_argument("--threads", type=int, default=os.cpu_count(),
+                        help="CPU threads (torch and ONNX Runtime)")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--engine", choices=["fp32", "int8", "onnx"], default=None)
+    args = parser.parse_args()
+
+    set_cpu_threads(args.threads)
+    summary = transcribe_files(
+        collect_files(args.source),
+        args.output,
+        batch_size=args.batch_size,
+        batch_seconds=args.batch_seconds,
+        device=args.device,
+        engine=args.engine,
+    )
+    print(summary)
@@ -0,0 +1,153 @@
+"""Bounded conversation context for the LLM
+
+The full history keeps growing, but only a token-budgeted window of it is sent to the
+model: the system prompt is always pinned, the most recent turns are kept verbatim and
+older turns are rolled into a running summary (or dropped if summarization is off).
+"""
+
+import math
+import re
+import sys
+from functools import lru_cache
+
+sys.path.append("./")
+from src.llm_client import chat_once
+from config import CONTEXT_SUMMARIZE, CONTEXT_TOKEN_BUDGET, OLLAMA_MODEL
+
+MESSAGE_OVERHEAD = 4  # role and chat template tokens per message
+SUMMARY_PROMPT = (
+    "Summarize the conversation below in a few sentences. Keep names, numbers, facts and "
+    "the user's preferences, skip greetings. Write in the language the user mostly uses."
+)
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text: str) -> int:
+    """Estimates the number of LLM tokens in text (no tokenizer needed).
+
+    Latin words take about 4 characters per token, Cyrillic ones about 3, punctuation
+    marks are one token each.
+    """
+    tokens = 0
+    for piece in re.findall(r"\w+|[^\w\s]", text):
+        cyrillic = any("\u0400" <= char <= "\u04FF" for char in piece)
+        tokens += math.ceil(len(piece) / (3 if cyrillic else 4))
+    return tokens
+
+
+def message_tokens(message: dict) -> int:
+    """Estimates tokens of one chat message, including its template overhead."""
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+class ContextManager:
+    """Builds the list of messages sent to the LLM for a growing history.
+
+    Args:
+        budget (int, optional): Max prompt tokens. Defaults to CONTEXT_TOKEN_BUDGET.
+        summarize (bool, optional): Roll dropped turns into a summary instead of just
+            dropping them. Defaults to CONTEXT_SUMMARIZE.
+        model (str, optional): Ollama model that writes summaries. Defaults to OLLAMA_MODEL.
+        low_water (float, optional): When over budget, old turns are folded until the
+            prompt is below this share of the budget, so it doesn't happen every turn.
+    """
+
+    def __init__(self, budget=CONTEXT_TOKEN_BUDGET, summarize=CONTEXT_SUMMARIZE, model=OLLAMA_MODEL,
+                 low_water=0.75):
+        self.budget = budget
+        self.summarize = summarize
+        self.model = model
+        self.low_water = low_water
+        self.summary = ""
+        self.folded = 0  # history messages (after the system prompt) no longer sent verbatim
+        self.last_report = {}
+        self._warned = False
+
+    def _summary_message(self) -> list:
+        if not self.summary:
+            return []
+        return [{"role": "system", "content": "Summary of the earlier conversation: " + self.summary}]
+
+    def _fold(self, messages: list) -> None:
+        """Rolls messages into the running summary."""
+        if not messages:
+            return
+        self.folded += len(messages)
+        if not self.summarize:
+            return
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in messages)
+        if self.summary:
+            transcript = f"Earlier summary: {self.summary}\n{transcript}"
+        self.summary = chat_once(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": transcript},
+            ],
+        ).strip()
+
+    def build(self, history: list) -> list:
+        """Returns the messages to send for `history` and updates last_report.
+
+        Args:
+            history (list): Full conversation, optionally starting with the system prompt.
+                It's expected to only grow (new turns are appended).
+
+        Returns:
+            list: System prompt, summary of older turns (if any) and the recent turns.
+        """
+        pinned = history[:1] if history and history[0]["role"] == "system" else []
+        turns = history[len(pinned):]
+        if self.folded > len(turns):  # a different history was passed in
+            self.summary, self.folded = "", 0
+        recent = turns[self.folded:]
+
+        def size(messages):
+            return sum(message_tokens(message) for message in messages)
+
+        room = self.budget - size(pinned)
+        if room <= 0:
+            # Nothing would fit next to it: the budget then only applies to the other messages
+            if not self._warned:
+                print(f"Context: the system prompt (~{size(pinned)} tokens) is over the budget "
+                      f"of {self.budget} tokens", file=sys.stderr)
+                self._warned = True
+            room = self.budget
+        if size(self._summary_message()) + size(recent) > room:
+            target = room * self.low_water - size(self._summary_message())
+            keep = len(recent)
+            # The latest message (the user's prompt) is always sent
+            while keep > 1 and size(recent[len(recent) - keep:]) > target:
+                keep -= 1
+            # Turns are folded whole: an answer isn't sent without its question
+            while keep > 1 and recent[len(recent) - keep]["role"] == "assistant":
+                keep -= 1
+            self._fold(recent[: len(recent) - keep])
+            recent = recent[len(recent) - keep:]
+
+        messages = pinned + self._summary_message() + recent
+        self.last_report = {
+            "messages": len(messages),
+            "prompt_tokens": size(messages),
+            "budget": self.budget,
+            "folded": self.folded,
+            "summarized": self.summarize,
+        }
+        return messages
+
+
+def format_report(report: dict) -> str:
+    """Formats a context report as one line for the console."""
+    folded = "summarized" if report.get("summarized") else "dropped"
+    return (f"Context: {report['messages']} messages, ~{report['prompt_tokens']}/"
+            f"{report['budget']} tokens, {report['folded']} older messages {folded}")
+
+
+if __name__ == "__main__":
+    manager = ContextManager(budget=60, summarize=False)
+    HISTORY = [{"role": "system", "content": "You are a helpful assistant."}]
+    for number in range(6):
+        HISTORY.append({"role": "user", "content": f"Question number {number} about the menu?"})
+        HISTORY.append({"role": "assistant", "content": f"Answer number {number}."})
+        manager.build(HISTORY)
+        print(format_report(manager.last_report))
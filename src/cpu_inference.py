@@ -0,0 +1,135 @@
+"""CPU-optimized inference for the speech models
+
+Engines:
+  - "fp32": the original PyTorch weights (the only choice on GPU).
+  - "int8": dynamic int8 quantization of Linear layers (PyTorch, no extra deps).
+  - "onnx": ONNX Runtime session exported from the Wav2Vec2-Bert model (needs
+    `onnx` and `onnxruntime`), exported once and kept in ./data/model_data/onnx/.
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import torch
+
+sys.path.append("./")
+from config import CPU_ENGINE, CPU_THREADS
+
+ENGINES = ("fp32", "int8", "onnx")
+ONNX_DIR = "./data/model_data/onnx/"
+_THREADS = {"count": CPU_THREADS}  # changed by set_cpu_threads()
+
+
+def resolve_engine(device: str, engine=None, cpu_default=CPU_ENGINE) -> str:
+    """Returns the inference engine to use on a device.
+
+    Args:
+        device (str): Resolved torch device.
+        engine (str, optional): "fp32", "int8" or "onnx". Defaults to fp32 on GPU and
+            `cpu_default` on CPU.
+        cpu_default (str, optional): Engine of a model on CPU. Defaults to CPU_ENGINE.
+
+    Raises:
+        ValueError: If the engine is unknown or can't run on the device.
+    """
+    if engine is None:
+        engine = "fp32" if device.startswith("cuda") else cpu_default
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown inference engine: {engine}")
+    if engine != "fp32" and device.startswith("cuda"):
+        raise ValueError(f"Engine {engine} runs on CPU only, got device {device}")
+    return engine
+
+
+def configure_cpu_threads() -> None:
+    """Applies CPU_THREADS from config (or set_cpu_threads()) to PyTorch (None keeps the default)."""
+    if _THREADS["count"]:
+        torch.set_num_threads(_THREADS["count"])
+
+
+def set_cpu_threads(count: int) -> None:
+    """Overrides CPU_THREADS for PyTorch and for ONNX Runtime sessions created afterwards."""
+    _THREADS["count"] = count
+    configure_cpu_threads()
+
+
+def quantize_int8(module: torch.nn.Module) -> torch.nn.Module:
+    """Quantizes Linear layers of a module to int8 in place (weights int8, activations
+    quantized on the fly), returns the module."""
+    return torch.ao.quantization.quantize_dynamic(
+        module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
+
+
+class _LogitsOnly(torch.nn.Module):
+    """Exposes a CTC model as (input_features, attention_mask) -> logits for export."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_features, attention_mask):  # pylint: disable=missing-function-docstring
+        return self.model(input_features, attention_mask=attention_mask).logits
+
+
+def export_ctc_onnx(model, example_inputs, onnx_path: str) -> None:
+    """Exports a CTC model to ONNX with dynamic batch and time axes.
+
+    Args:
+        model: AutoModelForCTC on CPU.
+        example_inputs: Processor output with input_features and attention_mask.
+        onnx_path (str): Where to save the model.
+    """
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model),
+            (example_inputs.input_features, example_inputs.attention_mask),
+            onnx_path,
+            input_names=["input_features", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_features": {0: "batch", 1: "time"},
+                "attention_mask": {0: "batch", 1: "time"},
+                "logits": {0: "batch", 1: "frames"},
+            },
+            opset_version=17,
+        )
+
+
+class OnnxCTCModel:
+    """ONNX Runtime session with the call signature of AutoModelForCTC.
+
+    Args:
+        onnx_path (str): Exported model.
+    """
+
+    def __init__(self, onnx_path: str):
+        import onnxruntime  # pylint: disable=import-outside-toplevel
+
+        options = onnxruntime.SessionOptions()
+        if _THREADS["count"]:
+            options.intra_op_num_threads = _THREADS["count"]
+        self.session = onnxruntime.InferenceSession(
+            onnx_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.size_bytes = os.path.getsize(onnx_path)  # read by the model registry
+
+    def __call__(self, input_features, attention_mask=None):
+        if attention_mask is None:
+            attention_mask = torch.ones(input_features.shape[:2], dtype=torch.int64)
+        (logits,) = self.session.run(
+            ["logits"],
+            {
+                "input_features": input_features.cpu().numpy(),
+                "attention_mask": attention_mask.cpu().numpy().astype("int64"),
+            },
+        )
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+
+def onnx_path_for(model_name: str) -> str:
+    """Returns where the ONNX export of a model is kept."""
+    return os.path.join(ONNX_DIR, model_name.replace("/", "__") + ".onnx")
@@ -0,0 +1,86 @@
+"""Automatic (UA or EN) speech recognition
+
+With SPECULATIVE_STT the language ID and both recognizers start at once in a thread
+pool and the transcript matching the language ID verdict is returned, so the latencies
+don't add up. The other recognizer is stopped cooperatively: Ukrainian STT of long audio
+stops after the window being decoded, English STT is skipped if it hasn't been sent yet.
+A short Ukrainian utterance or a Google request already in flight still runs to the end
+(its result is dropped), so speculation costs up to one extra recognition per utterance.
+Otherwise language ID runs first and only the matching recognizer runs after it.
+"""
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append("./")
+from src.audio import SAMPLE_RATE, read_audio
+from src.tracing import TRACER
+from config import SPECULATIVE_STT
+
+_EXECUTOR = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _EXECUTOR  # pylint: disable=global-statement
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=3, thread_name_prefix="stt")
+    return _EXECUTOR
+
+
+def transcribe_auto(audio, speculative=SPECULATIVE_STT) -> tuple:
+    """
+    Detects the language of speech and transcribes it.
+
+    Args:
+        audio (str or np.ndarray): Path to a 16 kHz audio file or 16 kHz mono float32 array.
+        speculative (bool, optional): Run language ID and both recognizers concurrently.
+            Defaults to SPECULATIVE_STT from config.
+
+    Returns:
+        tuple: ("ua" or "en", transcribed text)
+    """
+    audio = read_audio(audio)  # read once, shared by all stages
+    with TRACER.span("stt", audio_s=round(len(audio) / SAMPLE_RATE, 3)) as span:
+        lang, text = _transcribe(audio, speculative)
+        span.set(lang=lang, speculative=speculative)
+    return lang, text
+
+
+def _transcribe(audio, speculative) -> tuple:
+    # Recognizers pull in torch/transformers/speechbrain, so they're imported on first use
+    # pylint: disable=import-outside-toplevel
+    from src.english_stt import en_transcribe
+    from src.identify_lang import detect_ua_family
+    from src.ukrainian_stt import ua_transcribe
+
+    if not speculative:
+        if detect_ua_family(audio)["ua"]:
+            return "ua", ua_transcribe(audio)
+        return "en", en_transcribe(audio)
+
+    def english(stop):
+        # The Google request itself can't be interrupted, only not sent
+        return None if stop.is_set() else en_transcribe(audio)
+
+    executor = _get_executor()
+    stop_ua, stop_en = threading.Event(), threading.Event()
+    verdict = executor.submit(detect_ua_family, audio)
+    ua_text = executor.submit(ua_transcribe, audio, stop=stop_ua)
+    en_text = executor.submit(english, stop_en)
+    try:
+        is_ua = verdict.result()["ua"]
+    except BaseException:
+        stop_ua.set()
+        stop_en.set()
+        raise
+    if is_ua:
+        stop_en.set()
+        return "ua", ua_text.result()
+    stop_ua.set()
+    return "en", en_text.result()
+
+
+if __name__ == "__main__":
+    print(transcribe_auto("./data/wav/UA_test.wav"))
+    print(transcribe_auto("./data/wav/EN_test.wav"))
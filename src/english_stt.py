@@ -1,21 +1,40 @@
 """Module providing speech recognition"""
 
+import numpy as np
 import speech_recognition as sr
 
+from src.audio import SAMPLE_RATE, to_pcm16_bytes
+from src.tracing import TRACER
+from config import GOOGLE_STT_ENDPOINT
 
-def en_transcribe(wav_filename="./data/wav/EN_test.wav"):
-    """Function transcribe/recognize english wav."""
+
+def en_transcribe(wav_filename="./data/wav/EN_test.wav", endpoint=GOOGLE_STT_ENDPOINT):
+    """Function transcribe/recognize english wav (file path or 16 kHz mono float32 array).
+
+    Args:
+        wav_filename (str or np.ndarray, optional): Audio to recognize.
+        endpoint (str, optional): Google recognizer URL, e.g. a local FakeGoogleSTTServer.
+            Defaults to GOOGLE_STT_ENDPOINT (None - the library default).
+    """
     recognizer = sr.Recognizer()
 
-    # Open the audio file and recognize it
-    with sr.AudioFile(wav_filename) as source:
-        audio_data = recognizer.record(source)
-        try:
+    # Open the audio file (or wrap in-memory audio) and recognize it
+    if isinstance(wav_filename, np.ndarray):
+        audio_data = sr.AudioData(to_pcm16_bytes(wav_filename), SAMPLE_RATE, 2)
+    else:
+        with sr.AudioFile(wav_filename) as source:
+            audio_data = recognizer.record(source)
+    duration = len(audio_data.frame_data) / (audio_data.sample_rate * audio_data.sample_width)
+    try:
+        # Network round-trip to the Google recognizer
+        with TRACER.span("stt.en", audio_s=round(duration, 3)):
+            if endpoint:
+                return recognizer.recognize_google(audio_data, endpoint=endpoint)
             return recognizer.recognize_google(audio_data)
-        except sr.UnknownValueError:
-            return "Didn't recognize that."
-        except sr.RequestError as e:
-            return f"Could not request results; {e}"
+    except sr.UnknownValueError:
+        return "Didn't recognize that."
+    except sr.RequestError as e:
+        return f"Could not request results; {e}"
 
 
 # Example usage
@@ -0,0 +1,251 @@
+"""Local stand-ins for network services used by the voice pipeline
+
+They let the speech path run and be benchmarked with no network access:
+  - FakeEdgeTTSServer speaks the edge-tts websocket protocol and returns silent mp3
+    audio whose length follows the text length.
+  - FakeOllamaServer answers /api/chat and /api/generate like Ollama, streaming a
+    canned reply, and records the requests (options, keep_alive) it received.
+  - FakeGoogleSTTServer answers the legacy Google speech API used by
+    recognize_google() with a set transcript.
+
+Servers run on the caller's event loop (await start()) or in a background thread
+(start_in_thread()) for synchronous clients.
+"""
+
+import abc
+import asyncio
+import html
+import json
+import re
+import threading
+import time
+import uuid
+
+from aiohttp import WSMsgType, web
+
+# One MPEG-2 Layer III frame, 24 kHz mono 48 kbit/s (edge-tts output format),
+# all-zero side info and data decode as 24 ms of silence
+SILENT_MP3_FRAME = b"\xff\xf3\x64\xc0" + b"\x00" * 140
+FRAME_SECONDS = 576 / 24000
+
+
+class _FakeServer(abc.ABC):
+    """aiohttp server on localhost that can run on a given loop or in its own thread."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.requests = []
+        self._runner = None
+        self._thread_loop = None
+
+    @abc.abstractmethod
+    def _routes(self, app: web.Application) -> None:
+        """Adds the server's handlers to the app."""
+
+    def _url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        """Starts serving on the running loop and returns the server URL."""
+        app = web.Application()
+        self._routes(app)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]  # pylint: disable=protected-access
+        return self._url()
+
+    async def stop(self) -> None:
+        """Stops the server."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def start_in_thread(self) -> str:
+        """Starts serving from a daemon thread and returns the server URL."""
+        self._thread_loop = asyncio.new_event_loop()
+        threading.Thread(target=self._thread_loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(self.start(), self._thread_loop).result()
+
+    def stop_thread(self) -> None:
+        """Stops a server started with start_in_thread()."""
+        asyncio.run_coroutine_threadsafe(self.stop(), self._thread_loop).result()
+        self._thread_loop.call_soon_threadsafe(self._thread_loop.stop)
+
+
+def _headers(request_id: str, path: str, content_type: str) -> str:
+    return f"X-RequestId:{request_id}\r\nContent-Type:{content_type}\r\nPath:{path}\r\n"
+
+
+class FakeEdgeTTSServer(_FakeServer):
+    """Websocket server imitating the edge-tts synthesis service.
+
+    Args:
+        host (str, optional): Interface to bind. Defaults to "127.0.0.1".
+        port (int, optional): Port, 0 picks a free one. Defaults to 0.
+        latency (float, optional): Delay before the first audio chunk, seconds.
+        seconds_per_char (float, optional): Length of generated audio per character.
+        frames_per_chunk (int, optional): mp3 frames sent in one websocket message.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, seconds_per_char=0.06, frames_per_chunk=20):
+        super().__init__(host, port)
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+        self.frames_per_chunk = frames_per_chunk
+
+    def _routes(self, app):
+        app.router.add_get("/{tail:.*}", self._handle)
+
+    def _url(self) -> str:
+        # edge-tts appends "&ConnectionId=..." so the URL must already have a query
+        return f"ws://{self.host}:{self.port}/edge/v1?TrustedClientToken=fake"
+
+    async def _handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for message in ws:
+            if message.type != WSMsgType.TEXT or "Path:ssml" not in message.data:
+                continue
+            match = re.search(r"X-RequestId:(\w+)", message.data)
+            request_id = match.group(1) if match else uuid.uuid4().hex
+            text = html.unescape(re.sub(r"<[^>]+>", "", message.data.split("\r\n\r\n", 1)[-1])).strip()
+            self.requests.append(text)
+            await self._respond(ws, request_id, text)
+        return ws
+
+    async def _respond(self, ws, request_id, text):
+        json_type = "application/json; charset=utf-8"
+        await ws.send_str(_headers(request_id, "turn.start", json_type) + "\r\n{}")
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        frames = max(1, int(len(text) * self.seconds_per_char / FRAME_SECONDS))
+        header = _headers(request_id, "audio", "audio/mpeg").encode("utf-8")
+        for start in range(0, frames, self.frames_per_chunk):
+            count = min(self.frames_per_chunk, frames - start)
+            await ws.send_bytes(len(header).to_bytes(2, "big") + header + SILENT_MP3_FRAME * count)
+        await ws.send_str(_headers(request_id, "turn.end", json_type) + "\r\n{}")
+
+
+class FakeOllamaServer(_FakeServer):
+    """HTTP server imitating the Ollama API for chat and generate requests.
+
+    Args:
+        host (str, optional): Interface to bind. Defaults to "127.0.0.1".
+        port (int, optional): Port, 0 picks a free one. Defaults to 0.
+        reply (str, optional): Text of every answer.
+        first_token_delay (float, optional): Delay before the first token, seconds.
+        token_delay (float, optional): Delay between tokens, seconds.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, reply="Sure! This is a fake answer. Anything else?",
+                 first_token_delay=0.0, token_delay=0.0):
+        super().__init__(host, port)
+        self.reply = reply
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+
+    def _routes(self, app):
+        app.router.add_post("/api/chat", self._chat)
+        app.router.add_post("/api/generate", self._generate)
+        app.router.add_get("/api/version", self._version)
+
+    async def _version(self, _request):
+        return web.json_response({"version": "0.0.0-fake"})
+
+    async def _chat(self, request):
+        return await self._answer(request, chat=True)
+
+    async def _generate(self, request):
+        return await self._answer(request, chat=False)
+
+    def _chunk(self, body, text, done, chat):
+        chunk = {
+            "model": body.get("model", ""),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "done": done,
+        }
+        if chat:
+            chunk["message"] = {"role": "assistant", "content": text}
+        else:
+            chunk["response"] = text
+        if done:
+            chunk.update({"done_reason": "stop", "prompt_eval_count": 0, "eval_count": 0})
+        return chunk
+
+    async def _answer(self, request, chat):
+        body = await request.json()
+        self.requests.append(body)
+        limit = (body.get("options") or {}).get("num_predict")
+        tokens = re.findall(r"\S+\s*", self.reply)
+        if limit is not None and limit >= 0:
+            tokens = tokens[:limit]
+        if self.first_token_delay:
+            await asyncio.sleep(self.first_token_delay)
+        if not body.get("stream", True):
+            return web.json_response(self._chunk(body, "".join(tokens), True, chat))
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        try:
+            for token in tokens:
+                await response.write(json.dumps(self._chunk(body, token, False, chat)).encode() + b"\n")
+                if self.token_delay:
+                    await asyncio.sleep(self.token_delay)
+            await response.write(json.dumps(self._chunk(body, "", True, chat)).encode() + b"\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            pass  # the client stopped reading (e.g. the answer was interrupted)
+        return response
+
+
+class FakeGoogleSTTServer(_FakeServer):
+    """HTTP server imitating the legacy Google speech API (recognize_google).
+
+    Args:
+        host (str, optional): Interface to bind. Defaults to "127.0.0.1".
+        port (int, optional): Port, 0 picks a free one. Defaults to 0.
+        transcript (str, optional): Text returned for every request, None or "" answers
+            like unintelligible speech.
+        latency (float, optional): Delay before answering, seconds.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, transcript="fake transcript", latency=0.0):
+        super().__init__(host, port)
+        self.transcript = transcript
+        self.latency = latency
+
+    def _routes(self, app):
+        app.router.add_post("/{tail:.*}", self._recognize)
+
+    def _url(self) -> str:
+        return f"http://{self.host}:{self.port}/speech-api/v2/recognize"
+
+    async def _recognize(self, request):
+        audio = await request.read()
+        self.requests.append(
+            {"bytes": len(audio), "content_type": request.headers.get("Content-Type"),
+             "lang": request.query.get("lang")}
+        )
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        lines = [{"result": []}]
+        if self.transcript:
+            alternative = {"transcript": self.transcript, "confidence": 0.9}
+            lines.append({"result": [{"alternative": [alternative], "final": True}], "result_index": 0})
+        body = "\n".join(json.dumps(line) for line in lines) + "\n"
+        return web.Response(text=body, content_type="application/json")
+
+
+if __name__ == "__main__":
+
+    async def _serve():
+        edge, llm, google = FakeEdgeTTSServer(), FakeOllamaServer(), FakeGoogleSTTServer()
+        print("Fake edge-tts endpoint:", await edge.start())
+        print("Fake Ollama host:", await llm.start())
+        print("Fake Google STT endpoint:", await google.start())
+        await asyncio.Event().wait()
+
+    asyncio.run(_serve())
@@ -0,0 +1,177 @@
+"""Append-only conversation history
+
+Every message is appended to data/history/<session>.jsonl as soon as it happens, so a
+crash loses nothing and saving never rewrites the whole history. Only the tail needed
+for the LLM context is read back. When a session file grows past HISTORY_MAX_RECORDS,
+older records are moved to a gzipped archive in a background thread, keeping the newest
+half, so compaction runs once per HISTORY_MAX_RECORDS / 2 messages, not every turn.
+"""
+
+import gzip
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+sys.path.append("./")
+from config import HISTORY_DIR, HISTORY_MAX_RECORDS
+
+
+def session_file_name(session: str) -> str:
+    """Returns the session name as a safe file name: letters, digits, "_", "-" and "." only.
+
+    Raises:
+        ValueError: If nothing usable is left (e.g. "" or "../").
+    """
+    name = re.sub(r"[^\w.-]+", "_", session).strip("._")
+    if not name:
+        raise ValueError(f"Invalid session name: {session!r}")
+    return name
+
+
+class HistoryStore:
+    """History of one session.
+
+    Args:
+        session (str, optional): Session name, one file per session (characters that
+            aren't safe in a file name are replaced with "_"). Defaults to "default".
+        directory (str, optional): Where session files live. Defaults to HISTORY_DIR.
+        max_records (int, optional): The live file is compacted once it has more records
+            than this; the newest half of them are kept. Defaults to HISTORY_MAX_RECORDS.
+    """
+
+    def __init__(self, session="default", directory=HISTORY_DIR, max_records=HISTORY_MAX_RECORDS):
+        self.session = session_file_name(session)
+        self.path = os.path.join(directory, f"{self.session}.jsonl")
+        self.archive_path = os.path.join(directory, f"{self.session}.archive.jsonl.gz")
+        self.max_records = max_records
+        self._lock = threading.Lock()
+        self._compactor = None
+        self._records = None  # lines in the live file, counted on first use
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def sessions(directory=HISTORY_DIR) -> list:
+        """Returns names of stored sessions."""
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[: -len(".jsonl")] for name in os.listdir(directory) if name.endswith(".jsonl"))
+
+    def append(self, message: dict) -> None:
+        """Appends one chat message ({"role", "content"}) and flushes it to disk."""
+        record = {"role": message["role"], "content": message["content"], "ts": time.time()}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            records = self._count_records()
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+            self._records = records + 1
+
+    def _count_records(self, block_size=1 << 20) -> int:
+        if self._records is None:
+            self._records = 0
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as file:
+                    for block in iter(lambda: file.read(block_size), b""):
+                        self._records += block.count(b"\n")
+        return self._records
+
+    def tail(self, count: int) -> list:
+        """Returns the last `count` messages, reading the file from its end.
+
+        Args:
+            count (int): Number of messages.
+
+        Returns:
+            list: Messages ({"role", "content"}), oldest first.
+        """
+        with self._lock:
+            lines = self._tail_lines(count)
+        messages = []
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # e.g. a line cut off by a crash
+            messages.append({"role": record["role"], "content": record["content"]})
+        return messages
+
+    def _tail_lines(self, count: int, block_size=65536) -> list:
+        if count <= 0 or not os.path.exists(self.path):
+            return []
+        with open(self.path, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            position, data = file.tell(), b""
+            while position > 0 and data.count(b"\n") <= count:
+                step = min(block_size, position)
+                position -= step
+                file.seek(position)
+                data = file.read(step) + data
+        lines = [line for line in data.split(b"\n") if line.strip()]
+        return [line.decode("utf-8", errors="replace") for line in lines[-count:]]
+
+    def compact(self) -> int:
+        """Moves all but the newest `max_records` // 2 records to the gzipped archive,
+        if there are more than `max_records`.
+
+        Returns:
+            int: Number of archived records.
+        """
+        with self._lock:
+            if not os.path.exists(self.path):
+                return 0
+            with open(self.path, "r", encoding="utf-8") as file:
+                lines = file.readlines()
+            self._records = len(lines)
+            if len(lines) <= self.max_records:
+                return 0
+            keep = self.max_records // 2
+            old, recent = lines[: len(lines) - keep], lines[len(lines) - keep :]
+            with gzip.open(self.archive_path, "at", encoding="utf-8") as archive:
+                archive.writelines(old)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                file.writelines(recent)
+            os.replace(tmp_path, self.path)
+            self._records = len(recent)
+            return len(old)
+
+    def compact_in_background(self) -> None:
+        """Starts compact() in a daemon thread if the live file has more than `max_records`
+        records and no compaction is running already."""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        with self._lock:
+            if self._count_records() <= self.max_records:
+                return
+        self._compactor = threading.Thread(target=self.compact, daemon=True)
+        self._compactor.start()
+
+    def import_json(self, json_path: str) -> int:
+        """Imports a legacy HISTORY.json (list of messages) into an empty session, once.
+
+        A `<json_path>.imported` marker naming the session is written afterwards, so the
+        file isn't imported again into other (new) sessions.
+
+        Returns:
+            int: Number of imported messages (system prompts are skipped).
+        """
+        marker = json_path + ".imported"
+        if not os.path.exists(json_path) or os.path.exists(marker) or os.path.exists(self.path):
+            return 0
+        with open(json_path, "r", encoding="UTF-8") as file:
+            messages = [m for m in json.load(file) if m["role"] != "system"]
+        for message in messages:
+            self.append(message)
+        with open(marker, "w", encoding="utf-8") as file:
+            file.write(self.session + "\n")
+        return len(messages)
+
+
+if __name__ == "__main__":
+    for name in HistoryStore.sessions():
+        print(name, HistoryStore(name).tail(2))
@@ -1,35 +1,210 @@
 "Python"
 import warnings
+import numpy as np
+import torch
 from speechbrain.inference.classifiers import EncoderClassifier
-from torch.cuda import is_available
+
+from src.audio import SAMPLE_RATE, read_audio
+from src.cpu_inference import configure_cpu_threads, quantize_int8, resolve_engine
+from src.model_registry import REGISTRY, resolve_device
+from src.tracing import TRACER
+from config import LID_CONFIDENCE, LID_CPU_ENGINE, LID_EARLY_EXIT_MS, LID_LANGUAGES, LID_UA_FAMILY
 
 # Suppress warnings
 warnings.filterwarnings("ignore")
 
+LID_MODEL_NAME = "speechbrain/lang-id-voxlingua107-ecapa"
+
+
+def _load_lid_model(model_name, device, engine="fp32"):
+    """Loads the ECAPA language-id classifier (called by the registry on a miss)."""
+    language_id = EncoderClassifier.from_hparams(
+        source=model_name,
+        savedir="./data/model_data/",
+        run_opts={"device": device},
+    )
+    if engine == "int8":
+        configure_cpu_threads()
+        quantize_int8(language_id.mods)
+    return language_id
+
+
+def load_lid_model(model_name=LID_MODEL_NAME, device=None, engine=None) -> EncoderClassifier:
+    """Returns the shared language identification model, loading it on first use.
+
+    Args:
+        model_name (str, optional): Pre-trained model. Defaults to lang-id-voxlingua107-ecapa.
+        device (str, optional): Device for computation. Defaults to "cuda" if available.
+        engine (str, optional): "fp32" or "int8". Defaults to fp32 on GPU, LID_CPU_ENGINE on CPU
+            ("onnx" isn't available for ECAPA and means int8 here).
+
+    Returns:
+        EncoderClassifier: The loaded classifier.
+    """
+    device = resolve_device(device)
+    engine = resolve_engine(device, engine, cpu_default=LID_CPU_ENGINE)
+    if engine == "onnx":
+        engine = "int8"
+    return REGISTRY.get(
+        f"{model_name}:{engine}",
+        device,
+        lambda _key, _device: _load_lid_model(model_name, _device, engine),
+    )
+
 
-def identify_language(wav_filename="./data/wav/UA_test.wav") -> list:
+def identify_language(wav_filename="./data/wav/UA_test.wav", engine=None, device=None) -> list:
     """
     Identifies the language of an audio file using a pre-trained language identification model.
 
     Args:
-        wav_filename (str, optional): Path to the audio file. Defaults to "UA_test.wav".
+        wav_filename (str or np.ndarray, optional): Path to the audio file or 16 kHz mono\
+            float32 array. Defaults to "UA_test.wav".
+        engine (str, optional): "fp32" or "int8". Defaults to fp32 on GPU, LID_CPU_ENGINE on CPU.
+        device (str, optional): Device for computation. Defaults to "cuda" if available.
 
     Returns:
         list: Predicted language ID.
     """
-    # Load the pre-trained language identification model
-    language_id = EncoderClassifier.from_hparams(
-        source="speechbrain/lang-id-voxlingua107-ecapa",
-        savedir="./data/model_data/",
-        run_opts="cuda" if is_available() else None,
-    )
-    # Load the audio file
-    signal = language_id.load_audio(wav_filename, savedir="./data/")
+    # Get the pre-trained language identification model (loaded once per process)
+    language_id = load_lid_model(device=device, engine=engine)
+    # Load the audio file (in-memory audio is wrapped without copying)
+    if isinstance(wav_filename, np.ndarray):
+        signal = torch.from_numpy(wav_filename)
+    else:
+        signal = language_id.load_audio(wav_filename, savedir="./data/")
     # Classify the audio file
     prediction = language_id.classify_batch(signal)
     # Return the predicted language ID
     return prediction[3]
 
 
+def _label_indices(language_id, languages) -> dict:
+    """Returns {language code: classifier output index} for the given codes."""
+    indices = {}
+    for label, index in language_id.hparams.label_encoder.lab2ind.items():
+        code = label.split(":")[0]  # labels look like "uk: Ukrainian"
+        if code in languages:
+            indices[code] = index
+    return indices
+
+
+def _score(language_id, audio, indices) -> dict:
+    """Classifies audio, returns probabilities renormalized over `indices` only."""
+    out_prob = language_id.classify_batch(torch.from_numpy(audio))[0][0]
+    subset = torch.softmax(out_prob[list(indices.values())], dim=-1)
+    return dict(zip(indices, subset.tolist()))
+
+
+def _score_batch(language_id, audios, indices) -> list:
+    """Classifies several audios in one forward pass (zero-padded, with relative lengths)."""
+    longest = max(len(audio) for audio in audios)
+    batch = np.zeros((len(audios), longest), dtype=np.float32)
+    for row, audio in enumerate(audios):
+        batch[row, : len(audio)] = audio
+    lengths = torch.tensor([len(audio) / longest for audio in audios])
+    out_prob = language_id.classify_batch(torch.from_numpy(batch), wav_lens=lengths)[0]
+    subset = torch.softmax(out_prob[:, list(indices.values())], dim=-1)
+    return [dict(zip(indices, row.tolist())) for row in subset]
+
+
+def _ua_score(scores: dict) -> float:
+    return sum(score for code, score in scores.items() if code in LID_UA_FAMILY)
+
+
+def _verdict(scores: dict, early_exit: bool) -> dict:
+    ua_score = _ua_score(scores)
+    return {
+        "ua": ua_score >= 0.5,
+        "confidence": max(ua_score, 1.0 - ua_score),
+        "scores": scores,
+        "early_exit": early_exit,
+    }
+
+
+def detect_ua_family(
+    wav_filename="./data/wav/UA_test.wav",
+    languages=LID_LANGUAGES,
+    early_exit_ms=LID_EARLY_EXIT_MS,
+    confidence=LID_CONFIDENCE,
+    engine=None,
+) -> dict:
+    """
+    Decides whether speech is Ukrainian-family (uk/pl/ru/be) or not.
+
+    Only `languages` are scored, and a confident verdict on the first `early_exit_ms`
+    of audio skips classifying the whole utterance.
+
+    Args:
+        wav_filename (str or np.ndarray, optional): Path to the audio file or 16 kHz mono\
+            float32 array. Defaults to "UA_test.wav".
+        languages (tuple, optional): Language codes to score. Defaults to LID_LANGUAGES.
+        early_exit_ms (int, optional): Length of the first pass, 0 disables it.
+        confidence (float, optional): Confidence needed to stop after the first pass.
+        engine (str, optional): "fp32" or "int8". Defaults to fp32 on GPU, LID_CPU_ENGINE on CPU.
+
+    Returns:
+        dict: "ua" (bool), "confidence" of that verdict, "scores" per language and
+            "early_exit" (True if the first pass was enough).
+    """
+    language_id = load_lid_model(engine=engine)
+    indices = _label_indices(language_id, languages)
+    audio = read_audio(wav_filename)
+
+    head = int(early_exit_ms * SAMPLE_RATE / 1000)
+    passes = [audio[:head], audio] if 0 < head < len(audio) else [audio]
+    with TRACER.span("lid", audio_s=round(len(audio) / SAMPLE_RATE, 3)) as span:
+        for number, part in enumerate(passes):
+            scores = _score(language_id, part, indices)
+            ua_score = _ua_score(scores)
+            if max(ua_score, 1.0 - ua_score) >= confidence:
+                break
+        span.set(passes=number + 1, ua=ua_score >= 0.5)
+    return _verdict(scores, early_exit=number == 0 and len(passes) > 1)
+
+
+def detect_ua_family_batch(
+    audios,
+    languages=LID_LANGUAGES,
+    early_exit_ms=LID_EARLY_EXIT_MS,
+    confidence=LID_CONFIDENCE,
+    engine=None,
+) -> list:
+    """
+    detect_ua_family() for several utterances, batched into (at most) two forward passes.
+
+    The first pass classifies the first `early_exit_ms` of every utterance, the second
+    one only the whole utterances whose first-pass verdict wasn't confident enough.
+
+    Args:
+        audios (list): Paths or 16 kHz mono float32 arrays.
+        languages, early_exit_ms, confidence, engine: As in detect_ua_family().
+
+    Returns:
+        list: Verdict dicts (see detect_ua_family), in the order of `audios`.
+    """
+    language_id = load_lid_model(engine=engine)
+    indices = _label_indices(language_id, languages)
+    audios = [read_audio(audio) for audio in audios]
+    head = int(early_exit_ms * SAMPLE_RATE / 1000)
+    seconds = sum(len(audio) for audio in audios) / SAMPLE_RATE
+    verdicts = [None] * len(audios)
+
+    with TRACER.span("lid.batch", size=len(audios), audio_s=round(seconds, 3)):
+        if head > 0:
+            for index, scores in enumerate(
+                _score_batch(language_id, [audio[:head] for audio in audios], indices)
+            ):
+                ua_score = _ua_score(scores)
+                # Short utterances were classified whole already
+                if max(ua_score, 1.0 - ua_score) >= confidence or len(audios[index]) <= head:
+                    verdicts[index] = _verdict(scores, early_exit=len(audios[index]) > head)
+        rest = [index for index, verdict in enumerate(verdicts) if verdict is None]
+        if rest:
+            for index, scores in zip(rest, _score_batch(language_id, [audios[i] for i in rest], indices)):
+                verdicts[index] = _verdict(scores, early_exit=False)
+    return verdicts
+
+
 if __name__ == "__main__":
     print(identify_language())
+    print(detect_ua_family())
@@ -0,0 +1,171 @@
+"""Shared Ollama client
+
+One ollama.Client per process keeps its HTTP connections open between requests.
+Every request passes keep_alive, so the model stays loaded between turns, and the
+configured options (num_ctx, num_thread). warm_up() loads the model and evaluates the
+system prompt ahead of time; later requests starting with the same prompt reuse it.
+With ANSWER_CACHE on, repeated questions are answered from the answer cache instead.
+The ollama package (httpx, pydantic) is imported when the client is first created,
+normally by the background warm-up, so it doesn't delay startup.
+
+Usage (against a local fake server, no Ollama needed):
+    python -m src.llm_client --fake
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+sys.path.append("./")
+from src.answer_cache import get_answer_cache, replay
+from src.tracing import TRACER
+from config import ANSWER_CACHE, OLLAMA_HOST, OLLAMA_KEEP_ALIVE, OLLAMA_MODEL, OLLAMA_OPTIONS, SYS_MSG
+
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+_WARMED = set()  # (host, model) pairs already warmed up
+
+
+def get_client(host=OLLAMA_HOST):
+    """Returns the process-wide Ollama client.
+
+    Args:
+        host (str, optional): Ollama URL, used when the client is created. Defaults to
+            OLLAMA_HOST from config (None - OLLAMA_HOST env variable or localhost).
+    """
+    global _CLIENT  # pylint: disable=global-statement
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            from ollama import Client  # pylint: disable=import-outside-toplevel
+
+            _CLIENT = Client(host=host)
+        return _CLIENT
+
+
+def set_host(host: str) -> None:
+    """Points the shared client at another server (e.g. a FakeOllamaServer)."""
+    from ollama import Client  # pylint: disable=import-outside-toplevel
+
+    global _CLIENT  # pylint: disable=global-statement
+    with _CLIENT_LOCK:
+        _CLIENT = Client(host=host)
+
+
+def options(**overrides) -> dict:
+    """Returns OLLAMA_OPTIONS with overrides applied and None values left out."""
+    merged = {**OLLAMA_OPTIONS, **overrides}
+    return {key: value for key, value in merged.items() if value is not None}
+
+
+def chat_stream(messages: list, model=OLLAMA_MODEL, cache=ANSWER_CACHE):
+    """
+    Sends messages to the LLM and returns a stream of responses.
+
+    Args:
+        messages (list): Conversation to answer.
+        model (str, optional): The Ollama model to use. Defaults to OLLAMA_MODEL.
+        cache (bool, optional): Replay a cached answer to the same question, cache new\
+            answers. Defaults to ANSWER_CACHE.
+
+    Returns:
+        Iterator of chunks, each with chunk["message"]["content"].
+    """
+    key = get_answer_cache().key(messages, model) if cache else None
+    answer = get_answer_cache().get(key) if key is not None else None
+    if answer is not None:
+        stream = replay(answer, model)
+    else:
+        stream = get_client().chat(
+            model=model, messages=messages, stream=True, options=options(), keep_alive=OLLAMA_KEEP_ALIVE
+        )
+        if key is not None:
+            stream = get_answer_cache().record(stream, key)
+    if not TRACER.enabled:
+        return stream
+    return _traced_stream(stream, model, cached=answer is not None)
+
+
+def _traced_stream(stream, model, cached=False):
+    """Passes the stream through, recording the request, first token and the whole answer."""
+    try:
+        TRACER.mark("llm.request")  # the request is sent on the first next()
+        with TRACER.span("llm", model=model, cached=cached) as span:
+            chunks = 0
+            for chunk in stream:
+                if chunks == 0:
+                    TRACER.mark("llm.first_token")
+                chunks += 1
+                yield chunk
+            span.set(chunks=chunks)
+    finally:
+        stream.close()
+
+
+def chat_once(messages: list, model=OLLAMA_MODEL) -> str:
+    """Sends messages to the LLM and returns the whole answer text."""
+    with TRACER.span("llm.once", model=model):
+        response = get_client().chat(
+            model=model, messages=messages, options=options(), keep_alive=OLLAMA_KEEP_ALIVE
+        )
+    return response["message"]["content"]
+
+
+def warm_up(model=OLLAMA_MODEL, system_prompt=SYS_MSG) -> None:
+    """Loads the model and evaluates the system prompt once per process and model.
+
+    Generates a single token, so the cost is (almost) only the prompt evaluation,
+    which Ollama then keeps cached for requests with the same prefix.
+    """
+    key = (str(get_client()._client.base_url), model)  # pylint: disable=protected-access
+    if key in _WARMED:
+        return
+    get_client().chat(
+        model=model,
+        messages=[{"role": "system", "content": system_prompt}],
+        options=options(num_predict=1),
+        keep_alive=OLLAMA_KEEP_ALIVE,
+    )
+    _WARMED.add(key)
+
+
+def warm_up_in_background(model=OLLAMA_MODEL, system_prompt=SYS_MSG) -> threading.Thread:
+    """Runs warm_up() in a daemon thread, errors (e.g. Ollama not running) are printed."""
+
+    def _run():
+        try:
+            warm_up(model, system_prompt)
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"Could not warm up {model}; {e}")
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the Ollama connection.")
+    parser.add_argument("--fake", action="store_true", help="use a local fake Ollama server")
+    parser.add_argument("--cache", action="store_true", help="answer the second turn from the answer cache")
+    args = parser.parse_args()
+
+    server = None
+    if args.fake:
+        from src.fake_servers import FakeOllamaServer  # pylint: disable=import-outside-toplevel
+
+        server = FakeOllamaServer()
+        set_host(server.start_in_thread())
+
+    start = time.perf_counter()
+    warm_up()
+    print(f"Warm-up: {time.perf_counter() - start:.3f}s")
+    for turn in range(2):
+        start, first_token = time.perf_counter(), None
+        for chunk in chat_stream([{"role": "system", "content": SYS_MSG},
+                                  {"role": "user", "content": "en: Hi!"}], cache=args.cache):
+            first_token = first_token or time.perf_counter() - start
+            print(chunk["message"]["content"], end="", flush=True)
+        print(f"\nTurn {turn}: first token {first_token:.3f}s, total {time.perf_counter() - start:.3f}s")
+    if server is not None:
+        print("Server saw:", [(r.get("keep_alive"), r.get("options")) for r in server.requests])
+        server.stop_thread()
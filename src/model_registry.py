@@ -0,0 +1,188 @@
+"""Process-wide registry of loaded models
+
+Heavy models (Wav2Vec2-Bert, ECAPA language-id) are loaded lazily on first use and
+kept in memory, keyed by model name and device, so every utterance reuses the same
+weights instead of reading them from disk again. Least recently used models are
+unloaded when the configured memory budget is exceeded.
+"""
+
+import threading
+from collections import OrderedDict
+
+from src.tracing import TRACER
+from config import MODEL_MEMORY_BUDGET_MB
+
+
+def _estimate_bytes(obj) -> int:
+    """Roughly estimates memory held by a model (parameters and buffers).
+
+    Args:
+        obj: torch module, speechbrain pretrained interface, or tuple/list of those.
+
+    Returns:
+        int: Number of bytes, 0 if it can't be estimated.
+    """
+    if isinstance(obj, (tuple, list)):
+        return sum(_estimate_bytes(item) for item in obj)
+    if isinstance(getattr(obj, "size_bytes", None), int):  # e.g. ONNX Runtime sessions
+        return obj.size_bytes
+    if hasattr(obj, "mods"):  # speechbrain Pretrained keeps its modules in .mods
+        return _estimate_bytes(obj.mods)
+    if callable(getattr(obj, "parameters", None)) and callable(getattr(obj, "buffers", None)):
+        tensors = list(obj.parameters()) + list(obj.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    return 0
+
+
+class ModelRegistry:
+    """Lazy, LRU-evicting cache of loaded models.
+
+    Args:
+        memory_budget_mb (float, optional): Upper bound for all loaded models.
+            None or 0 disables eviction. Defaults to MODEL_MEMORY_BUDGET_MB from config.
+    """
+
+    def __init__(self, memory_budget_mb=MODEL_MEMORY_BUDGET_MB):
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else 0
+        self._models = OrderedDict()  # (model_name, device) -> (model, size in bytes)
+        self._lock = threading.RLock()  # bookkeeping only, never held while loading
+        self._load_locks = {}  # (model_name, device) -> lock held while that model loads
+
+    def get(self, model_name: str, device: str, loader):
+        """Returns a loaded model, loading it with `loader` on first use.
+
+        Args:
+            model_name (str): Model identifier (e.g. "Yehor/w2v-bert-2.0-uk").
+            device (str): Device the model lives on (e.g. "cpu", "cuda:0").
+            loader (callable): loader(model_name, device) -> model, called only on a miss.
+
+        Returns:
+            The loaded model (whatever `loader` returned).
+
+        Concurrent calls for the same model wait for one load, while other models can be
+        loaded or used at the same time.
+        """
+        key = (model_name, device)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            with self._lock:
+                if key in self._models:  # loaded by another thread while this one waited
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+            with TRACER.span("model.load", model=model_name, device=device):
+                model = loader(model_name, device)
+            with self._lock:
+                self._models[key] = (model, _estimate_bytes(model))
+                self._evict(keep=key)
+                del self._load_locks[key]
+            return model
+
+    def warm_up(self, model_name: str, device: str, loader) -> None:
+        """Loads a model ahead of time so the first request doesn't pay for it."""
+        self.get(model_name, device, loader)
+
+    def unload(self, model_name: str = None, device: str = None) -> None:
+        """Unloads matching models (all of them if no arguments given)."""
+        with self._lock:
+            for key in list(self._models):
+                if model_name in (None, key[0]) and device in (None, key[1]):
+                    del self._models[key]
+        _empty_cuda_cache()
+
+    def loaded(self) -> dict:
+        """Returns {(model_name, device): size in bytes} of loaded models, oldest first."""
+        with self._lock:
+            return {key: size for key, (_, size) in self._models.items()}
+
+    def _evict(self, keep) -> None:
+        """Drops least recently used models until the budget is met (never `keep`)."""
+        if not self.memory_budget:
+            return
+        evicted = False
+        while sum(size for _, size in self._models.values()) > self.memory_budget:
+            victim = next((key for key in self._models if key != keep), None)
+            if victim is None:
+                break
+            del self._models[victim]
+            evicted = True
+        if evicted:
+            _empty_cuda_cache()
+
+
+def resolve_device(device=None) -> str:
+    """Returns a usable torch device, falling back to CPU when CUDA isn't available.
+
+    Args:
+        device (str, optional): "cpu", "cuda", "cuda:N", or None/"auto" for the best one.
+    """
+    import torch  # pylint: disable=import-outside-toplevel
+
+    if device in (None, "auto"):
+        return "cuda:0" if torch.cuda.is_available() else "cpu"
+    if str(device).startswith("cuda") and not torch.cuda.is_available():
+        return "cpu"
+    return device
+
+
+def _empty_cuda_cache() -> None:
+    """Releases cached CUDA memory after unloading, if torch with CUDA is present."""
+    try:
+        import torch  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+# Shared by main.py, app.py and the STT/LID modules
+REGISTRY = ModelRegistry()
+
+
+def warm_up_models() -> None:
+    """Loads the language-id and Ukrainian STT models used by the voice assistant."""
+    # pylint: disable=import-outside-toplevel
+    from src.identify_lang import load_lid_model
+    from src.ukrainian_stt import load_ua_model
+
+    load_lid_model()
+    load_ua_model()
+
+
+_WARM_UP = None
+_WARM_UP_LOCK = threading.Lock()
+
+
+def warm_up_models_in_background() -> threading.Thread:
+    """Imports the speech modules and loads the models in a daemon thread, once per process.
+
+    The entry points become interactive right away; a request that needs a model
+    before it's loaded waits for it in REGISTRY.get() instead of loading it twice.
+    Errors are printed.
+    """
+    global _WARM_UP  # pylint: disable=global-statement
+
+    def _run():
+        try:
+            # Speech output first: it's needed by every answer, even typed ones
+            import src.transcribe_speak  # pylint: disable=import-outside-toplevel,unused-import
+
+            warm_up_models()
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"Could not warm up models; {e}")
+
+    with _WARM_UP_LOCK:
+        if _WARM_UP is None:
+            _WARM_UP = threading.Thread(target=_run, name="warm-up", daemon=True)
+            _WARM_UP.start()
+    return _WARM_UP
+
+
+if __name__ == "__main__":
+    registry = ModelRegistry(memory_budget_mb=1)
+    registry.get("dummy-a", "cpu", lambda name, device: f"{name} on {device}")
+    print(registry.get("dummy-a", "cpu", lambda name, device: "not called"))
+    print(registry.loaded())
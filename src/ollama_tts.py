@@ -1,58 +1,91 @@
 "Run terminal, write to it and get text&audio response"
 
 import sys
-
-import asyncio
-from ollama import chat
+import threading
 
 sys.path.append("./")
-from src.transcribe_speak import transcribe_and_speak
-from config import SYS_MSG
+from src.context import ContextManager
+from src.context import format_report as format_context_report
+from src.history_store import HistoryStore
+from src.llm_client import chat_stream
+from src.segmenter import SentenceSegmenter
+from src.speech_pipeline import format_report, get_speech_pipeline
+from config import CONTEXT_REPORT, OLLAMA_MODEL, SPEECH_REPORT, SYS_MSG
 
 HISTORY = [{"role": "system", "content": SYS_MSG}]
+CONTEXT = ContextManager()
 
 
-def ollama_prompt(prompt: str = None, model="llama3.1", history: list = None) -> list:
+def ollama_prompt(
+    prompt: str = None,
+    model=OLLAMA_MODEL,
+    history: list = None,
+    context: ContextManager = None,
+    store: HistoryStore = None,
+    stop_event: threading.Event = None,
+) -> list:
     """
     Sends a prompt to the Ollama LLM and interacts with the user in a continuous loop.
 
     Args:
         prompt (str, optional): User's input prompt. Defaults to None.
-        model (str, optional): The Ollama model to use. Defaults to "llama3.1".
+        model (str, optional): The Ollama model to use. Defaults to OLLAMA_MODEL.
         history (list, optional): A list of dictionaries representing the conversation history.\
             Defaults to None.
+        context (ContextManager, optional): Picks which part of the history is sent to the LLM.\
+            Defaults to the module-level one.
+        store (HistoryStore, optional): Persists each message as soon as it's added.\
+            Defaults to None (history is kept in memory only).
+        stop_event (threading.Event, optional): Once set (e.g. the user started talking),\
+            generation and speech stop and the partial answer is kept. Defaults to None.
 
     Returns:
         None
     """
     history.append({"role": "user", "content": prompt})
-    stream = chat(model=model, messages=history, stream=True)
+    if store is not None:
+        store.append(history[-1])
+    context = context or CONTEXT
+    messages = context.build(history)
+    if CONTEXT_REPORT:
+        print(format_context_report(context.last_report))
+    stream = chat_stream(messages=messages, model=model)
 
-    sentence_chunks, response_text = "", ""
+    segmenter, response_text = SentenceSegmenter(), ""
+    speech = get_speech_pipeline()
     print("Assistant: ", end="")
 
     try:
         # Process each chunk in the LLM's response stream
         for part in stream:  # not bug but feature
+            if stop_event is not None and stop_event.is_set():
+                stream.close()  # drops the HTTP response, Ollama stops generating
+                speech.cancel()
+                break
             print(part["message"]["content"], end="", flush=True)
             content = part["message"]["content"]
-            sentence_chunks += content
             response_text += content
 
-            # Check for sentence ending and perform language detection and text-to-speech
-            if sentence_chunks.endswith(("**:", ".", "!", "?", '?"', '!"', ":", ")")):
-                if any("\u0400" <= char <= "\u04FF" for char in sentence_chunks):
-                    lang = "ua"
-                else:
-                    lang = "en"
-                asyncio.run(transcribe_and_speak(text=sentence_chunks, lang=lang))
-                sentence_chunks = ""
+            # Queue each completed sentence (with its language) for text-to-speech
+            for sentence, lang in segmenter.feed(content):
+                speech.say(text=sentence, lang=lang)
+        else:
+            for sentence, lang in segmenter.flush():
+                speech.say(text=sentence, lang=lang)
 
         # Add the final response and updated history to conversation history
         history.append({"role": "assistant", "content": response_text})
+        if store is not None:
+            store.append(history[-1])
+        report = speech.wait()
+        if SPEECH_REPORT:
+            print("\n" + format_report(report), end="")
 
     except KeyboardInterrupt:
+        speech.cancel()
         history.append({"role": "assistant", "content": response_text})
+        if store is not None:
+            store.append(history[-1])
     return print("")
 
 
@@ -61,7 +94,7 @@ if __name__ == "__main__":
         TALKING = True
         while TALKING:
             print("User:", end="")
-            ollama_prompt(prompt=input(), model="llama3.1", history=HISTORY)
+            ollama_prompt(prompt=input(), model=OLLAMA_MODEL, history=HISTORY)
             print()
     except KeyboardInterrupt:
         TALKING = False
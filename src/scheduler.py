@@ -0,0 +1,302 @@
+"""Shared inference scheduler for many concurrent sessions
+
+Sessions submit single utterances; one worker per model collects them into
+micro-batches (up to SCHEDULER_MAX_BATCH requests, waiting at most
+SCHEDULER_MAX_WAIT_MS for more to arrive) and runs each batch on the shared model in
+one forward pass, in a thread of its own, so language ID and Ukrainian STT batches
+overlap. Batches are filled round-robin over sessions, one request per session per
+round, so a busy session can't starve the others.
+
+Backpressure: submissions wait while SCHEDULER_MAX_QUEUE requests are in the system,
+and a session that already has SCHEDULER_MAX_PENDING requests in flight gets
+SchedulerBusy right away. English STT is a network call to the Google recognizer and
+isn't batched, only limited to a thread pool.
+"""
+
+import asyncio
+import contextlib
+import sys
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append("./")
+from src.audio import SAMPLE_RATE, read_audio
+from config import (
+    SCHEDULER_MAX_BATCH,
+    SCHEDULER_MAX_PENDING,
+    SCHEDULER_MAX_QUEUE,
+    SCHEDULER_MAX_WAIT_MS,
+    SPECULATIVE_STT,
+    UA_CHUNK_OVERLAP_SECONDS,
+    UA_CHUNK_SECONDS,
+)
+
+
+class SchedulerBusy(Exception):
+    """The session has too many requests in flight."""
+
+
+def lid_batch(audios: list) -> list:
+    """Language ID verdicts for a batch of utterances."""
+    from src.identify_lang import detect_ua_family_batch  # pylint: disable=import-outside-toplevel
+
+    return detect_ua_family_batch(audios)
+
+
+def ua_batch(audios: list) -> list:
+    """Ukrainian transcripts for a batch; long utterances are transcribed in chunks."""
+    # pylint: disable=import-outside-toplevel
+    from src.ukrainian_stt import ua_transcribe, ua_transcribe_batch
+
+    limit = (UA_CHUNK_SECONDS + 2 * UA_CHUNK_OVERLAP_SECONDS) * SAMPLE_RATE
+    short = [index for index, audio in enumerate(audios) if len(audio) <= limit]
+    texts = [None] * len(audios)
+    if short:
+        for index, text in zip(short, ua_transcribe_batch([audios[i] for i in short])):
+            texts[index] = text
+    for index, audio in enumerate(audios):
+        if texts[index] is None:
+            texts[index] = ua_transcribe(audio)
+    return texts
+
+
+def en_single(audio) -> str:
+    """English transcript of one utterance."""
+    from src.english_stt import en_transcribe  # pylint: disable=import-outside-toplevel
+
+    return en_transcribe(audio)
+
+
+class _BatchQueue:
+    """Per-session FIFO queues of one model, drained round-robin."""
+
+    def __init__(self, name: str, run_batch):
+        self.name = name
+        self.run_batch = run_batch
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"batch-{name}")
+        self.sessions = OrderedDict()  # session -> deque of (item, future)
+        self.size = 0
+        self.ready = asyncio.Event()  # something is queued
+        self.full = asyncio.Event()  # a whole batch is queued
+        self.batches = 0
+        self.items = 0
+
+    def put(self, session, item, future, max_batch: int) -> None:
+        self.sessions.setdefault(session, deque()).append((item, future))
+        self.size += 1
+        self.ready.set()
+        if self.size >= max_batch:
+            self.full.set()
+
+    def take(self, max_batch: int) -> list:
+        """Takes up to max_batch requests, one per session per round."""
+        batch = []
+        while self.sessions and len(batch) < max_batch:
+            session, requests = next(iter(self.sessions.items()))
+            batch.append(requests.popleft())
+            # The session goes to the back of the line
+            if requests:
+                self.sessions.move_to_end(session)
+            else:
+                del self.sessions[session]
+        self.size -= len(batch)
+        if not self.size:
+            self.ready.clear()
+        self.full.clear()
+        return batch
+
+
+class InferenceScheduler:
+    """Micro-batches LID and STT requests of many sessions onto the shared models.
+
+    Args:
+        max_batch (int, optional): Requests per forward pass. Defaults to SCHEDULER_MAX_BATCH.
+        max_wait_ms (int, optional): How long a batch may wait to fill up.
+            Defaults to SCHEDULER_MAX_WAIT_MS.
+        max_queue (int, optional): Requests in the system before submit() waits.
+            Defaults to SCHEDULER_MAX_QUEUE.
+        max_pending (int, optional): Requests in flight per session before SchedulerBusy.
+            Defaults to SCHEDULER_MAX_PENDING.
+        lid (callable, optional): Batch language ID, list of arrays -> list of verdicts.
+        ua (callable, optional): Batch Ukrainian STT, list of arrays -> list of texts.
+        en (callable, optional): English STT of one array.
+    """
+
+    def __init__(
+        self,
+        max_batch=SCHEDULER_MAX_BATCH,
+        max_wait_ms=SCHEDULER_MAX_WAIT_MS,
+        max_queue=SCHEDULER_MAX_QUEUE,
+        max_pending=SCHEDULER_MAX_PENDING,
+        lid=lid_batch,
+        ua=ua_batch,
+        en=en_single,
+    ):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self._max_queue = max_queue
+        self._batch_functions = {"lid": lid, "ua": ua}
+        self._en = en
+        self._en_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="stt-en")
+        self._queues = {}
+        self._workers = []
+        self._slots = None
+        self._in_flight = defaultdict(int)
+
+    async def start(self) -> None:
+        """Starts the batch workers on the running loop."""
+        self._slots = asyncio.Semaphore(self._max_queue)
+        for name, run_batch in self._batch_functions.items():
+            self._queues[name] = _BatchQueue(name, run_batch)
+            self._workers.append(asyncio.create_task(self._worker(self._queues[name])))
+
+    async def stop(self) -> None:
+        """Stops the workers; requests still queued are cancelled."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for queue in self._queues.values():
+            for requests in queue.sessions.values():
+                for _, future in requests:
+                    future.cancel()
+            queue.executor.shutdown(wait=False)
+        self._en_executor.shutdown(wait=False)
+
+    async def detect_language(self, session, audio) -> dict:
+        """Language ID verdict (see detect_ua_family) of one utterance."""
+        with self._admit(session):
+            return await self._submit("lid", session, audio)
+
+    async def transcribe_ua(self, session, audio) -> str:
+        """Ukrainian transcript of one utterance."""
+        with self._admit(session):
+            return await self._submit("ua", session, audio)
+
+    async def transcribe_en(self, session, audio) -> str:
+        """English transcript of one utterance."""
+        with self._admit(session):
+            return await self._submit("en", session, audio)
+
+    async def transcribe_auto(self, session, audio, speculative=SPECULATIVE_STT) -> tuple:
+        """Detects the language and transcribes, like dispatch.transcribe_auto().
+
+        Returns:
+            tuple: ("ua" or "en", transcribed text)
+        """
+        with self._admit(session):  # one request, however many models it uses
+            return await self._transcribe_auto(session, read_audio(audio), speculative)
+
+    async def _transcribe_auto(self, session, audio, speculative) -> tuple:
+        if not speculative:
+            if (await self._submit("lid", session, audio))["ua"]:
+                return "ua", await self._submit("ua", session, audio)
+            return "en", await self._submit("en", session, audio)
+
+        ua_text = asyncio.ensure_future(self._submit("ua", session, audio))
+        en_text = asyncio.ensure_future(self._submit("en", session, audio))
+        try:
+            verdict = await self._submit("lid", session, audio)
+        except BaseException:
+            ua_text.cancel()
+            en_text.cancel()
+            raise
+        # Cancelling drops a request that is still queued; one already in a running batch
+        # (or an English request already sent) runs to the end and its result is dropped
+        if verdict["ua"]:
+            en_text.cancel()
+            return "ua", await ua_text
+        ua_text.cancel()
+        return "en", await en_text
+
+    def stats(self) -> dict:
+        """Queued requests, batches run and mean batch size per model."""
+        return {
+            name: {
+                "queued": queue.size,
+                "sessions": len(queue.sessions),
+                "batches": queue.batches,
+                "mean_batch": queue.items / queue.batches if queue.batches else 0.0,
+            }
+            for name, queue in self._queues.items()
+        }
+
+    @contextlib.contextmanager
+    def _admit(self, session):
+        """Counts a request of the session, SchedulerBusy if it has too many in flight."""
+        if self._slots is None:
+            raise RuntimeError("InferenceScheduler.start() wasn't called")
+        if self._in_flight[session] >= self.max_pending:
+            raise SchedulerBusy(f"session {session} has {self._in_flight[session]} requests in flight")
+        self._in_flight[session] += 1
+        try:
+            yield
+        finally:
+            self._in_flight[session] -= 1
+            if not self._in_flight[session]:
+                del self._in_flight[session]
+
+    async def _submit(self, kind: str, session, audio):
+        async with self._slots:  # waits while the system is full
+            if kind == "en":
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._en_executor, self._en, audio)
+            future = asyncio.get_running_loop().create_future()
+            self._queues[kind].put(session, audio, future, self.max_batch)
+            return await future
+
+    async def _worker(self, queue: _BatchQueue) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await queue.ready.wait()
+            if queue.size < self.max_batch:
+                # Give other sessions a moment to join the batch
+                try:
+                    await asyncio.wait_for(queue.full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+            batch = [(item, future) for item, future in queue.take(self.max_batch) if not future.done()]
+            if not batch:
+                continue
+            queue.batches += 1
+            queue.items += len(batch)
+            try:
+                results = await loop.run_in_executor(
+                    queue.executor, queue.run_batch, [read_audio(item) for item, _ in batch]
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+if __name__ == "__main__":
+    import numpy as np
+
+    async def _demo():
+        # Stand-in models: 50 ms per batch regardless of size
+        def fake_lid(audios):
+            time.sleep(0.05)
+            return [{"ua": len(audio) % 2 == 0} for audio in audios]
+
+        def fake_ua(audios):
+            time.sleep(0.05)
+            return [f"{len(audio)} samples" for audio in audios]
+
+        scheduler = InferenceScheduler(lid=fake_lid, ua=fake_ua, en=lambda audio: "english")
+        await scheduler.start()
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(scheduler.transcribe_auto(f"session-{n}", np.zeros(16000 + n, np.float32)) for n in range(16))
+        )
+        print(f"16 sessions in {time.perf_counter() - start:.3f}s:", results[:3])
+        print(scheduler.stats())
+        await scheduler.stop()
+
+    asyncio.run(_demo())
@@ -0,0 +1,235 @@
+"""Incremental sentence segmentation of the LLM token stream for text-to-speech
+
+Tokens are fed as they arrive and only the new characters are examined. A segment is
+emitted at the end of a sentence or clause (. ! ? … ; : or a line break) once it is at
+least min_chars long, so short fragments ("1.", "Yes.", "**Title**:") are merged with
+what follows instead of paying a TTS round-trip each. Dots in numbers ("3.5"),
+abbreviations ("e.g.", "т.д.") and initials don't end a sentence. Long runs without
+punctuation are cut at the last comma or space before max_chars. When the text switches
+between Cyrillic and Latin for longer than min_chars, the segment is cut at the start
+of that run as soon as possible. Shorter runs (e.g. a translated word, "apple is
+яблуко.") are split off at word boundaries when the segment is emitted, so every word
+goes to the voice of its own language.
+"""
+
+import re
+import sys
+
+sys.path.append("./")
+from config import SEGMENT_MAX_CHARS, SEGMENT_MIN_CHARS
+
+TERMINATORS = ".!?…;:"
+CLOSERS = "\"'»”)]*"
+SOFT_BREAKS = ",;—–"
+OPENERS = "\"'«“([*"
+ABBREVIATIONS = {
+    "e.g", "i.e", "etc", "vs", "mr", "mrs", "ms", "dr", "prof", "st", "no", "approx",
+    "т.д", "т.п", "т.ч", "напр", "див", "ім", "р", "рр", "ст", "грн", "тис", "млн", "млрд",
+    "вул", "с", "м", "пп", "проф", "д-р",
+}
+
+
+def script_of(char: str):
+    """Returns "ua" for Cyrillic letters, "en" for other letters and None otherwise."""
+    if "\u0400" <= char <= "\u04FF":
+        return "ua"
+    if char.isalpha():
+        return "en"
+    return None
+
+
+def word_script(text: str):
+    """Returns the script ("ua" or "en") most letters of text are in, None without letters."""
+    scripts = [script_of(char) for char in text]
+    cyrillic, latin = scripts.count("ua"), scripts.count("en")
+    if not cyrillic and not latin:
+        return None
+    return "ua" if cyrillic >= latin else "en"
+
+
+def script_runs(text: str) -> list:
+    """Splits text at word boundaries where the script changes, however short the runs.
+
+    Words without letters (numbers, dashes) stay with the run before them, or the
+    first run if they lead.
+
+    Returns:
+        list: (text, lang) tuples, "en" for text without letters.
+    """
+    runs = []
+    for match in re.finditer(r"\S+\s*", text):
+        word = match.group()
+        script = word_script(word)
+        if runs and (script is None or runs[-1][1] in (None, script)):
+            runs[-1][0] += word
+            runs[-1][1] = runs[-1][1] or script
+        else:
+            runs.append([word, script])
+    return [(run.strip(), lang or "en") for run, lang in runs]
+
+
+class SentenceSegmenter:
+    """Turns a stream of text chunks into speakable segments.
+
+    Args:
+        min_chars (int, optional): Shorter segments are joined with the next one.\
+            Defaults to SEGMENT_MIN_CHARS.
+        max_chars (int, optional): Longer segments are cut at a comma or space.\
+            Defaults to SEGMENT_MAX_CHARS.
+        split_scripts (bool, optional): Cut segments where Cyrillic and Latin runs meet.\
+            Defaults to True.
+    """
+
+    def __init__(self, min_chars=SEGMENT_MIN_CHARS, max_chars=SEGMENT_MAX_CHARS, split_scripts=True):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.split_scripts = split_scripts
+        self._buffer = ""
+        self._reset_state(0)
+
+    def _reset_state(self, start: int) -> None:
+        # Indices point into self._buffer and are shifted when its head is dropped
+        self._start = start  # where the pending segment begins
+        self._end = None  # just past a terminator that may end the sentence
+        self._word_start = start
+        self._script = None  # script of the pending segment
+        self._switch = None  # where a run in the other script began
+        self._switch_script = None
+
+    def feed(self, text: str) -> list:
+        """Adds a chunk of the stream.
+
+        Args:
+            text (str): New text, e.g. one LLM token.
+
+        Returns:
+            list: Completed segments as (text, lang) tuples, lang is "ua" or "en".
+        """
+        segments = []
+        position = len(self._buffer)
+        self._buffer += text
+        for index in range(position, len(self._buffer)):
+            self._scan(index, segments)
+        # Drop what was emitted, the buffer never grows past about max_chars
+        if self._start:
+            shift = self._start
+            self._buffer = self._buffer[shift:]
+            self._start = 0
+            self._word_start = max(0, self._word_start - shift)
+            for name in ("_end", "_switch"):
+                value = getattr(self, name)
+                if value is not None:
+                    setattr(self, name, value - shift)
+        return segments
+
+    def flush(self) -> list:
+        """Returns whatever is left at the end of the stream as (text, lang) tuples."""
+        segments = []
+        self._emit(len(self._buffer), segments)
+        self._buffer = ""
+        self._reset_state(0)
+        return segments
+
+    def _scan(self, index: int, segments: list) -> None:
+        char = self._buffer[index]
+        if char.isspace():
+            if self._end is not None and self._is_sentence_end():
+                self._emit(self._end, segments)
+            elif char == "\n" and self._length(index) >= self.min_chars:
+                self._emit(index, segments)
+            self._end = None
+            self._word_start = index + 1
+        elif char in TERMINATORS:
+            self._end = index + 1
+        elif char in CLOSERS and self._end == index:
+            self._end = index + 1
+        else:
+            self._end = None
+            script = script_of(char)
+            if script is not None:
+                self._track_script(index, script, segments)
+        if index + 1 - self._start >= self.max_chars:
+            self._cut(index + 1, segments)
+
+    def _track_script(self, index: int, script: str, segments: list) -> None:
+        if self._script is None:
+            self._script = script
+        elif script == self._script:
+            self._switch = None  # a single foreign word, spoken by the segment's voice
+        elif self.split_scripts:
+            if self._switch is None:
+                self._switch, self._switch_script = self._word_start, script
+                return
+            switch, switch_script = self._switch, self._switch_script
+            # Both the foreign run and the text before it are long enough to be spoken
+            if index + 1 - switch >= self.min_chars and self._length(switch) >= self.min_chars:
+                self._emit(switch, segments)
+                self._script = switch_script
+
+    def _is_sentence_end(self) -> bool:
+        if self._length(self._end) < self.min_chars:
+            return False
+        terminator = self._end - 1
+        while self._buffer[terminator] in CLOSERS:
+            terminator -= 1
+        if self._buffer[terminator] != ".":
+            return True
+        word = self._buffer[self._word_start : terminator].lstrip(OPENERS).lower()
+        if word in ABBREVIATIONS:
+            return False
+        if len(word) == 1 and word.isalpha():  # an initial, "J. Smith"
+            return False
+        return True
+
+    def _cut(self, end: int, segments: list) -> None:
+        """Ends an overlong segment at the last soft break or space before `end`."""
+        text = self._buffer[self._start : end]
+        cut = max(text.rfind(mark) for mark in SOFT_BREAKS)
+        if cut <= 0:
+            cut = text.rfind(" ")
+        cut = self._start + cut + 1 if cut > 0 else end
+        self._emit(cut, segments)
+        for char in self._buffer[cut:end]:
+            if script_of(char) is not None:
+                self._script = script_of(char)
+
+    def _emit(self, end: int, segments: list) -> None:
+        """Emits buffer[start:end] (if it has anything to say) and starts a new segment."""
+        text = self._buffer[self._start : end].strip()
+        if self.split_scripts:
+            parts = script_runs(text)
+        else:
+            parts = [(text, word_script(text) or "en")]
+        for part, lang in parts:
+            if any(char.isalnum() for char in part):
+                segments.append((part, lang))
+        word_start = max(self._word_start, end)
+        self._reset_state(end)
+        self._word_start = word_start
+
+    def _length(self, end: int) -> int:
+        return len(self._buffer[self._start : end].strip())
+
+
+def split_sentences(text: str, **kwargs) -> list:
+    """Segments a complete text, e.g. for pre-warming the TTS cache.
+
+    Returns:
+        list: (text, lang) tuples.
+    """
+    segmenter = SentenceSegmenter(**kwargs)
+    return segmenter.feed(text) + segmenter.flush()
+
+
+if __name__ == "__main__":
+    SAMPLE = (
+        "1. Price is 3.5 USD, e.g. for tea. Ok! The word apple in Ukrainian "
+        "is яблуко. Слово яблуко означає фрукт, so use it carefully.\n\n"
+        "**Tip**: Читайте вголос щодня, це допомагає запам'ятовувати слова."
+    )
+    SEGMENTER = SentenceSegmenter()
+    for token in SAMPLE.split(" "):
+        for segment in SEGMENTER.feed(token + " "):
+            print(segment)
+    for segment in SEGMENTER.flush():
+        print(segment)
@@ -0,0 +1,212 @@
+"""Producer/consumer speech pipeline
+
+The LLM stream keeps being read while sentences are spoken: say() only queues a
+sentence, a persistent event loop synthesizes queued sentences ahead of time, and a
+playback thread plays the synthesized audio in order. So sentence N+1 is being
+synthesized while sentence N is playing.
+
+The TTS and audio modules (edge_tts, pygame) are imported by the worker threads, so
+creating the pipeline doesn't block on them. If they can't be imported, the error is
+printed and sentences are finished without audio, so wait() still returns.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+
+from src.tracing import TRACER
+
+
+class SpeechPipeline:
+    """Queues sentences, synthesizes them ahead and plays them back in order.
+
+    Args:
+        max_ready (int, optional): How many synthesized sentences may wait for playback.
+            Defaults to 3.
+    """
+
+    def __init__(self, max_ready=3):
+        self._loop = asyncio.new_event_loop()
+        self._sentences = None  # asyncio.Queue, created on the loop
+        self._ready = queue.Queue(maxsize=max_ready)
+        self._pending = 0
+        self._generation = 0  # bumped by cancel(), stale items are dropped
+        self._done = threading.Condition()
+        self._timings = []
+        self._turn_start = None
+        self._first_audio = None
+        self._max_depth = 0
+        self._stop_audio = None  # set by the playback worker once pygame is imported
+
+        started = threading.Event()
+        threading.Thread(target=self._run_loop, args=(started,), daemon=True).start()
+        started.wait()
+        threading.Thread(target=self._playback_worker, daemon=True).start()
+
+    def _run_loop(self, started):
+        asyncio.set_event_loop(self._loop)
+        self._sentences = asyncio.Queue()
+        self._loop.create_task(self._synthesis_worker())
+        self._loop.call_soon(started.set)
+        self._loop.run_forever()
+
+    def say(self, text: str, lang="en") -> None:
+        """Queues a sentence to be spoken and returns immediately.
+
+        Args:
+            text (str): Sentence to speak.
+            lang (str, optional): "en" or "ua". Defaults to "en".
+        """
+        with self._done:
+            if self._turn_start is None:
+                self._turn_start = time.perf_counter()
+            self._pending += 1
+            item = {"text": text, "lang": lang, "generation": self._generation}
+            item["queued"] = time.perf_counter()
+        self._loop.call_soon_threadsafe(self._sentences.put_nowait, item)
+
+    def queue_depth(self) -> dict:
+        """Returns how many sentences wait for synthesis and for playback."""
+        return {"synthesis": self._sentences.qsize(), "playback": self._ready.qsize()}
+
+    async def _synthesis_worker(self):
+        try:
+            from src.transcribe_speak import synthesize  # pylint: disable=import-outside-toplevel
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"\nSpeech synthesis is unavailable; {e}")
+            synthesize = None
+
+        while True:
+            item = await self._sentences.get()
+            if item["generation"] != self._generation:
+                self._finish(item)
+                continue
+            depth = self._sentences.qsize() + self._ready.qsize() + 1
+            self._max_depth = max(self._max_depth, depth)
+            item["synth_start"] = time.perf_counter()
+            item["audio"] = None
+            if synthesize is not None:
+                try:
+                    item["audio"] = await synthesize(text=item["text"], lang=item["lang"])
+                except Exception as e:  # pylint: disable=broad-except
+                    print(f"\nCould not synthesize speech; {e}")
+            item["synth_end"] = time.perf_counter()
+            # Blocking put runs in the default executor, so the loop stays responsive
+            await self._loop.run_in_executor(None, self._ready.put, item)
+
+    def _playback_worker(self):
+        try:
+            # pylint: disable=import-outside-toplevel
+            from src.transcribe_speak import play_audio, stop_audio
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"\nAudio playback is unavailable; {e}")
+            play_audio = None
+        else:
+            self._stop_audio = stop_audio
+
+        while True:
+            item = self._ready.get()
+            if item["audio"] and play_audio is not None and item["generation"] == self._generation:
+                item["play_start"] = time.perf_counter()
+                if self._first_audio is None:
+                    self._first_audio = item["play_start"]
+                TRACER.mark("audio.first")
+                with TRACER.span("tts.play", chars=len(item["text"])):
+                    play_audio(item["audio"])
+                item["play_end"] = time.perf_counter()
+            item.pop("audio")
+            self._finish(item)
+
+    def _finish(self, item):
+        with self._done:
+            if item["generation"] == self._generation:  # cancelled turns aren't reported
+                self._timings.append(item)
+            self._pending -= 1
+            self._done.notify_all()
+
+    def cancel(self) -> None:
+        """Drops queued sentences, stops current playback and resets the turn stats.
+
+        Safe to call from any thread: nothing is imported here, and without playback
+        (not started yet or unavailable) there's nothing to stop.
+        """
+        with self._done:
+            self._generation += 1
+            self._reset_stats()
+        if self._stop_audio is not None:
+            self._stop_audio()
+
+    def wait(self) -> dict:
+        """Blocks until everything queued so far was spoken.
+
+        Returns:
+            dict: Timings of the turn (see report()), stats are reset afterwards.
+        """
+        with self._done:
+            self._done.wait_for(lambda: self._pending == 0)
+            report = self.report()
+            self._reset_stats()
+        return report
+
+    def _reset_stats(self):
+        self._timings, self._turn_start, self._first_audio = [], None, None
+        self._max_depth = 0
+
+    def report(self) -> dict:
+        """Summarizes the current turn.
+
+        Returns:
+            dict: sentences, max_queue_depth, time_to_first_audio, turn_time (seconds)
+                and mean per-stage times: queue_wait, synthesis, playback_wait, playback.
+        """
+        played = [item for item in self._timings if "play_end" in item]
+        synthesized = [item for item in self._timings if "synth_end" in item]
+
+        def mean(values):
+            values = list(values)
+            return sum(values) / len(values) if values else None
+
+        start = self._turn_start
+        return {
+            "sentences": len(self._timings),
+            "max_queue_depth": self._max_depth,
+            "time_to_first_audio": self._first_audio - start if self._first_audio else None,
+            "turn_time": max(i["play_end"] for i in played) - start if played else None,
+            "queue_wait": mean(i["synth_start"] - i["queued"] for i in synthesized),
+            "synthesis": mean(i["synth_end"] - i["synth_start"] for i in synthesized),
+            "playback_wait": mean(i["play_start"] - i["synth_end"] for i in played),
+            "playback": mean(i["play_end"] - i["play_start"] for i in played),
+        }
+
+
+_PIPELINE = None
+_PIPELINE_LOCK = threading.Lock()
+
+
+def get_speech_pipeline() -> SpeechPipeline:
+    """Returns the process-wide speech pipeline, starting it on first use."""
+    global _PIPELINE  # pylint: disable=global-statement
+    with _PIPELINE_LOCK:
+        if _PIPELINE is None:
+            _PIPELINE = SpeechPipeline()
+        return _PIPELINE
+
+
+def format_report(report: dict) -> str:
+    """Formats a pipeline report as one line for the console."""
+    parts = []
+    for key, value in report.items():
+        if isinstance(value, float):
+            parts.append(f"{key}={value:.2f}s")
+        elif value is not None:
+            parts.append(f"{key}={value}")
+    return "Speech: " + ", ".join(parts)
+
+
+if __name__ == "__main__":
+    speech = get_speech_pipeline()
+    speech.say("I'd be happy to try singing for you.", "en")
+    speech.say("Я б залюбки для тебе заспівала.", "ua")
+    speech.say("And here is the third sentence.", "en")
+    print(format_report(speech.wait()))
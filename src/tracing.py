@@ -0,0 +1,239 @@
+"""Per-turn latency tracing
+
+Stages wrap their work in TRACER.span("name") and mark moments with TRACER.mark("name").
+A turn runs from the end of the user's speech (start_turn) until the answer was spoken
+(end_turn); its spans and marks are written as one JSON line to TRACE_FILE with:
+  - time_to_first_token: LLM request sent -> first token received
+  - time_to_first_audio: turn start -> first synthesized sentence starts playing
+  - stt_rtf: recognition time / speech duration (below 1 is faster than real time)
+Spans outside a turn (e.g. model loading) are written as separate lines.
+
+With TRACE = False span() returns a shared no-op object and mark() returns at once,
+so instrumented code pays one attribute check.
+
+Usage:
+    python -m src.tracing [data/traces.jsonl]  # summary table of a trace file
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.append("./")
+from config import TRACE, TRACE_FILE
+
+# Stage timings that make up a turn, in pipeline order (summary rows)
+STAGES = ("lid", "stt.ua", "stt.en", "stt", "llm", "tts.synthesize", "tts.play")
+METRICS = ("time_to_first_token", "time_to_first_audio", "stt_rtf", "turn_time")
+
+
+class _NullSpan:
+    """What span() returns when tracing is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        """Ignores attributes."""
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """A timed stage, used as a context manager. Attributes can be added with set()."""
+
+    __slots__ = ("tracer", "name", "attrs", "start", "end")
+
+    def __init__(self, tracer, name: str, attrs: dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = self.end = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.tracer._record(self)  # pylint: disable=protected-access
+        return False
+
+    def set(self, **attrs):
+        """Adds attributes (e.g. audio length, cache hit) to the span."""
+        self.attrs.update(attrs)
+
+    @property
+    def duration(self) -> float:
+        """Seconds between enter and exit."""
+        return self.end - self.start
+
+
+class Tracer:
+    """Collects spans and marks of the current turn and writes finished turns to a file.
+
+    Args:
+        path (str, optional): JSONL trace file. Defaults to TRACE_FILE.
+        enabled (bool, optional): Defaults to TRACE from config.
+    """
+
+    def __init__(self, path=TRACE_FILE, enabled=TRACE):
+        self.path = path
+        self.enabled = enabled
+        self.turns = []  # finished turn records of this process, for summary()
+        self._lock = threading.Lock()
+        self._turn = None
+
+    def span(self, name: str, **attrs):
+        """Returns a context manager timing the stage `name`."""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, attrs)
+
+    def mark(self, name: str, **attrs) -> None:
+        """Records a moment of the current turn; only the first mark of a name is kept."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            if self._turn is not None and name not in self._turn["marks"]:
+                self._turn["marks"][name] = now
+                self._turn["attrs"].update(attrs)
+
+    def start_turn(self, **attrs):
+        """Starts a turn (ends the previous one if it's still open).
+
+        Returns:
+            The turn handle for end_turn(), None when tracing is off.
+        """
+        if not self.enabled:
+            return None
+        self.end_turn(interrupted=True)
+        turn = {"start": time.perf_counter(), "wall": time.time(), "attrs": attrs}
+        turn.update({"spans": [], "marks": {}})
+        with self._lock:
+            self._turn = turn
+        return turn
+
+    def end_turn(self, turn=None, **attrs):
+        """Ends the current turn, writes it to the trace file and returns its record.
+
+        Args:
+            turn (optional): Handle from start_turn(); nothing happens if that turn was
+                already ended (e.g. replaced by a newer one). Defaults to the current turn.
+            **attrs: Attributes added to the turn record.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._turn is None or turn not in (None, self._turn):
+                return None
+            turn, self._turn = self._turn, None
+        turn["attrs"].update(attrs)
+        record = self._turn_record(turn, time.perf_counter())
+        self.turns.append(record)
+        self._write(record)
+        return record
+
+    def _record(self, span: Span) -> None:
+        with self._lock:
+            turn = self._turn
+            if turn is not None:
+                turn["spans"].append(span)
+                return
+        self._write(
+            {"type": "span", "ts": time.time(), "name": span.name,
+             "duration": round(span.duration, 4), **span.attrs}
+        )
+
+    @staticmethod
+    def _turn_record(turn: dict, end: float) -> dict:
+        start = turn["start"]
+        spans = [
+            {"name": s.name, "start": round(s.start - start, 4), "duration": round(s.duration, 4),
+             **s.attrs}
+            for s in turn["spans"]
+        ]
+        marks = {name: round(moment - start, 4) for name, moment in turn["marks"].items()}
+        metrics = {"turn_time": round(end - start, 4)}
+        if "llm.first_token" in marks and "llm.request" in marks:
+            first_token = marks["llm.first_token"] - marks["llm.request"]
+            metrics["time_to_first_token"] = round(first_token, 4)
+        if "audio.first" in marks:
+            metrics["time_to_first_audio"] = marks["audio.first"]
+        stt = [s for s in spans if s["name"] == "stt" and s.get("audio_s")]
+        if stt:
+            metrics["stt_rtf"] = round(stt[0]["duration"] / stt[0]["audio_s"], 4)
+        return {"type": "turn", "ts": turn["wall"], **turn["attrs"], "metrics": metrics,
+                "marks": marks, "spans": spans}
+
+    def _write(self, record: dict) -> None:
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line)
+
+
+def _percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(records: list) -> dict:
+    """Groups turn records into {row name: list of values (seconds, RTF for stt_rtf)}."""
+    rows = {}
+    for record in records:
+        if record.get("type") != "turn":
+            continue
+        for name in METRICS:
+            if name in record["metrics"]:
+                rows.setdefault(name, []).append(record["metrics"][name])
+        for span in record["spans"]:
+            rows.setdefault(span["name"], []).append(span["duration"])
+    return rows
+
+
+def format_summary(records: list) -> str:
+    """Formats a table of count, mean, p50, p95 and max per metric and stage."""
+    rows = summarize(records)
+    names = [name for name in METRICS if name in rows]
+    names += [name for name in STAGES if name in rows]
+    names += sorted(name for name in rows if name not in names)
+    lines = [f"{'stage':<22}{'n':>5}{'mean':>9}{'p50':>9}{'p95':>9}{'max':>9}"]
+    for name in names:
+        values = rows[name]
+        lines.append(
+            f"{name:<22}{len(values):>5}{sum(values) / len(values):>9.3f}"
+            f"{_percentile(values, 0.5):>9.3f}{_percentile(values, 0.95):>9.3f}{max(values):>9.3f}"
+        )
+    return "\n".join(lines)
+
+
+def read_trace(path=TRACE_FILE) -> list:
+    """Reads the records of a trace file."""
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+TRACER = Tracer()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize a latency trace file.")
+    parser.add_argument("path", nargs="?", default=TRACE_FILE)
+    print(format_summary(read_trace(parser.parse_args().path)))
@@ -1,18 +1,76 @@
 """Text-To-Speech Interface with Pygame Audio Playback
 
-This module provides a function (`tts`) to convert text to speech using Edge TTS
-and play the generated audio using Pygame. It supports English (`en`) and Ukrainian
-(`uk`, `ua`) languages (for now).
+This module provides a function (`tts`) to convert text to speech using a TTS backend
+(Edge TTS by default, see tts_backends.py) and play the generated audio using Pygame.
+It supports English (`en`) and Ukrainian (`uk`, `ua`) languages (for now). Audio is kept
+in memory and in the TTS cache.
 """
 
 from os import environ
 import asyncio
-import edge_tts
+import io
+
+from src.tts_backends import select_backend
+from src.tracing import TRACER
+from src.tts_cache import get_tts_cache
 
 environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "hide"  # must be before import pygame
 import pygame
 
 
+async def synthesize(text, lang="en") -> bytes:
+    """
+    Converts text to speech with the configured TTS backend, or takes it from the TTS cache.
+
+    Args:
+        text (str): The text to be spoken.
+        lang (str, optional): The language for the TTS voice. Defaults to "en" (English).
+
+    Returns:
+        bytes: The whole audio (mp3 or wav), ready for play_audio().
+    """
+    backend = await select_backend(lang)
+    voice = f"{backend.name}:{backend.voice_for(lang)}"
+    cache = get_tts_cache()
+    with TRACER.span("tts.synthesize", voice=voice, chars=len(text)) as span:
+        audio = cache.get(text, voice, backend.rate)
+        span.set(cached=audio is not None)
+        if audio is None:
+            audio = await backend.synthesize(text=text, lang=lang)
+            if audio:
+                cache.put(text, voice, backend.rate, audio)
+    return audio
+
+
+_CLOCK = None
+
+
+def _init_mixer() -> None:
+    """Initializes the Pygame mixer once per process."""
+    global _CLOCK  # pylint: disable=global-statement
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+    if _CLOCK is None:
+        _CLOCK = pygame.time.Clock()
+
+
+def play_audio(audio: bytes) -> None:
+    """Plays mp3 or wav audio from memory with Pygame and blocks until playback ends."""
+    _init_mixer()
+    pygame.mixer.music.load(io.BytesIO(audio), "wav" if audio[:4] == b"RIFF" else "mp3")
+    pygame.mixer.music.play()
+
+    while pygame.mixer.music.get_busy():
+        _CLOCK.tick(50)
+    pygame.mixer.music.unload()
+
+
+def stop_audio() -> None:
+    """Stops current playback, if any."""
+    if pygame.mixer.get_init():
+        pygame.mixer.music.stop()
+
+
 async def transcribe_and_speak(text="Nice brackets, John!", lang="en") -> pygame.mixer.music:
     """
     Converts text to speech using Edge TTS and plays the generated audio.
@@ -25,24 +83,7 @@ async def transcribe_and_speak(text="Nice brackets, John!", lang="en") -> pygame
     Raises:
         ValueError: If the provided language is not supported.
     """
-    if lang in ["en"]:
-        voice = "en-GB-SoniaNeural"
-    elif lang in ["uk", "ua"]:
-        voice = "uk-UA-PolinaNeural"
-    else:
-        raise ValueError(f"Unsupported language: {lang}")
-    output_file = "./data/wav/transcribed_piece.mp3"
-    # Generate TTS audio
-    communicate = edge_tts.Communicate(text=text, voice=voice, rate="+30%")
-    await communicate.save(output_file)
-
-    # Play the audio file
-    pygame.mixer.init()
-    pygame.mixer.music.load(output_file)
-    pygame.mixer.music.play()
-
-    while pygame.mixer.music.get_busy():
-        pygame.time.Clock().tick(1)
+    play_audio(await synthesize(text=text, lang=lang))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,263 @@
+"""Pluggable Text-To-Speech backends
+
+Every backend has a voice registry per language and can synthesize text either to a
+single buffer or as a stream of audio chunks:
+  - "edge": Edge TTS (online, mp3), can be pointed at a local fake server.
+  - "espeak": espeak-ng (offline, wav), no network needed.
+
+TTS_BACKEND in config picks one by name, or "auto" picks the fastest available backend
+per language, measured once at runtime.
+
+Usage (benchmark):
+    python -m src.tts_backends [--fake-edge] [--repeat 3]
+"""
+
+import abc
+import argparse
+import asyncio
+import contextlib
+import shutil
+import sys
+import threading
+import time
+
+sys.path.append("./")
+from config import TTS_BACKEND, TTS_EDGE_ENDPOINT
+
+PROBE_TEXT = {"en": "Hello, how can I help?", "ua": "Привіт, чим можу допомогти?"}
+
+_EDGE_URL = {"original": None, "streams": 0}  # streams running with a replaced WSS_URL
+_EDGE_URL_LOCK = threading.Lock()
+
+
+@contextlib.contextmanager
+def _edge_endpoint(module, url: str):
+    """Points edge-tts at `url` while the block runs, then restores its own URL.
+
+    edge-tts has no endpoint argument: the URL is a module constant read on every
+    connection, so it stays replaced until the last stream using it has finished.
+    """
+    with _EDGE_URL_LOCK:
+        if not _EDGE_URL["streams"]:
+            _EDGE_URL["original"] = module.WSS_URL
+        elif module.WSS_URL != url:
+            raise RuntimeError(f"edge-tts is already streaming from {module.WSS_URL}")
+        module.WSS_URL = url
+        _EDGE_URL["streams"] += 1
+    try:
+        yield
+    finally:
+        with _EDGE_URL_LOCK:
+            _EDGE_URL["streams"] -= 1
+            if not _EDGE_URL["streams"]:
+                module.WSS_URL = _EDGE_URL["original"]
+
+
+class TTSBackend(abc.ABC):
+    """Base class for speech synthesizers.
+
+    Attributes:
+        name (str): Backend name used in config and in TTS cache keys.
+        voices (dict): Language code -> voice name.
+        rate (str): Speaking rate, as passed to the engine.
+    """
+
+    name = "base"
+    voices = {}
+    rate = ""
+
+    def available(self) -> bool:
+        """True if the backend can run on this machine."""
+        return True
+
+    def voice_for(self, lang="en") -> str:
+        """
+        Picks the voice for a language.
+
+        Raises:
+            ValueError: If the provided language is not supported.
+        """
+        if lang not in self.voices:
+            raise ValueError(f"Unsupported language: {lang}")
+        return self.voices[lang]
+
+    @abc.abstractmethod
+    async def stream(self, text, lang="en"):
+        """Yields audio chunks (bytes) as they are produced."""
+        yield b""
+
+    async def synthesize(self, text, lang="en") -> bytes:
+        """Returns the whole audio for text."""
+        chunks = []
+        async for data in self.stream(text=text, lang=lang):
+            chunks.append(data)
+        return b"".join(chunks)
+
+
+class EdgeTTSBackend(TTSBackend):
+    """Edge TTS voices (mp3).
+
+    Args:
+        endpoint (str, optional): Websocket URL replacing the Microsoft service, e.g. a
+            FakeEdgeTTSServer. Defaults to TTS_EDGE_ENDPOINT from config (None - real one).
+    """
+
+    name = "edge"
+    voices = {"en": "en-GB-SoniaNeural", "uk": "uk-UA-PolinaNeural", "ua": "uk-UA-PolinaNeural"}
+    rate = "+30%"
+
+    def __init__(self, endpoint=TTS_EDGE_ENDPOINT):
+        self.endpoint = endpoint
+
+    def available(self) -> bool:
+        try:
+            import edge_tts  # pylint: disable=import-outside-toplevel,unused-import
+        except ImportError:
+            return False
+        return True
+
+    async def stream(self, text, lang="en"):
+        import edge_tts  # pylint: disable=import-outside-toplevel
+
+        communicate = edge_tts.Communicate(text=text, voice=self.voice_for(lang), rate=self.rate)
+        endpoint = contextlib.nullcontext()
+        if self.endpoint:
+            endpoint = _edge_endpoint(edge_tts.communicate, self.endpoint)
+        with endpoint:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    yield chunk["data"]
+
+
+class EspeakBackend(TTSBackend):
+    """Offline espeak-ng voices (wav).
+
+    Args:
+        words_per_minute (int, optional): Speaking rate. Defaults to 230 (~ edge's +30%).
+    """
+
+    name = "espeak"
+    voices = {"en": "en-gb", "uk": "uk", "ua": "uk"}
+
+    def __init__(self, words_per_minute=230):
+        self.rate = str(words_per_minute)
+        self.executable = shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def available(self) -> bool:
+        return self.executable is not None
+
+    async def stream(self, text, lang="en"):
+        # The text goes through stdin (UTF-8), so text starting with "-" isn't read as an option
+        process = await asyncio.create_subprocess_exec(
+            self.executable,
+            "--stdout",
+            "--stdin",
+            "-b",
+            "1",
+            "-v",
+            self.voice_for(lang),
+            "-s",
+            self.rate,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        process.stdin.write(text.encode("utf-8"))
+        process.stdin.close()
+        while True:
+            data = await process.stdout.read(16384)
+            if not data:
+                break
+            yield data
+        await process.wait()
+
+
+BACKENDS = {"edge": EdgeTTSBackend, "espeak": EspeakBackend}
+
+_INSTANCES = {}
+_FASTEST = {}  # lang -> backend chosen by "auto"
+
+
+def get_backend(name: str) -> TTSBackend:
+    """Returns the shared instance of a backend by name."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown TTS backend: {name}")
+    if name not in _INSTANCES:
+        _INSTANCES[name] = BACKENDS[name]()
+    return _INSTANCES[name]
+
+
+async def measure(backend: TTSBackend, text: str, lang="en") -> dict:
+    """Times one synthesis.
+
+    Returns:
+        dict: first_chunk and total time in seconds, audio size in bytes.
+    """
+    start = time.perf_counter()
+    first_chunk, size = None, 0
+    async for data in backend.stream(text=text, lang=lang):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - start
+        size += len(data)
+    return {"first_chunk": first_chunk, "total": time.perf_counter() - start, "bytes": size}
+
+
+async def select_backend(lang="en", name=TTS_BACKEND) -> TTSBackend:
+    """Returns the backend to use for a language.
+
+    Args:
+        lang (str, optional): Language code. Defaults to "en".
+        name (str, optional): Backend name, or "auto" for the fastest available backend
+            (probed once per language). Defaults to TTS_BACKEND from config.
+    """
+    if name != "auto":
+        return get_backend(name)
+    if lang not in _FASTEST:
+        timings = {}
+        for candidate in BACKENDS:
+            backend = get_backend(candidate)
+            if not backend.available():
+                continue
+            try:
+                timings[candidate] = (await measure(backend, PROBE_TEXT.get(lang, "Hello."), lang))["total"]
+            except Exception:  # pylint: disable=broad-except
+                continue  # e.g. no network for edge
+        if not timings:
+            raise RuntimeError("No TTS backend is available")
+        _FASTEST[lang] = get_backend(min(timings, key=timings.get))
+    return _FASTEST[lang]
+
+
+async def benchmark(repeat=3) -> None:
+    """Prints synthesis timings of every available backend and language."""
+    for name in BACKENDS:
+        backend = get_backend(name)
+        if not backend.available():
+            print(f"{name:8} not available")
+            continue
+        for lang, text in PROBE_TEXT.items():
+            runs = [await measure(backend, text, lang) for _ in range(repeat)]
+            first = sorted(run["first_chunk"] or 0.0 for run in runs)[len(runs) // 2]
+            total = sorted(run["total"] for run in runs)[len(runs) // 2]
+            print(f"{name:8} {lang}  first chunk {first:.3f}s  total {total:.3f}s (median)")
+
+
+async def _main(args):
+    if args.fake_edge:
+        from src.fake_servers import FakeEdgeTTSServer  # pylint: disable=import-outside-toplevel
+
+        server = FakeEdgeTTSServer()
+        get_backend("edge").endpoint = await server.start()
+        try:
+            await benchmark(repeat=args.repeat)
+        finally:
+            await server.stop()
+    else:
+        await benchmark(repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TTS backends.")
+    parser.add_argument("--fake-edge", action="store_true", help="use a local fake edge-tts server")
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,194 @@
+"""Content-addressed cache of synthesized speech
+
+Audio is keyed by (text, voice, rate), kept in memory for the most recent phrases and
+on disk for everything else. Both levels evict least recently used entries once their
+byte budget is exceeded. Frequent replies ("Sure!", greetings, menu items) are then
+spoken without a round-trip to the TTS service.
+
+Usage:
+    python -m src.tts_cache prewarm phrases.txt [--lang en|ua|auto]
+    python -m src.tts_cache stats
+    python -m src.tts_cache clear
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+sys.path.append("./")
+from config import TTS_CACHE_DIR, TTS_CACHE_MAX_MB, TTS_CACHE_MEMORY_MB
+
+
+class TTSCache:
+    """Two-level (memory + disk) LRU cache of audio bytes.
+
+    Args:
+        cache_dir (str, optional): Directory for cached audio. Defaults to TTS_CACHE_DIR.
+        max_mb (float, optional): Disk budget. Defaults to TTS_CACHE_MAX_MB.
+        memory_mb (float, optional): Memory budget. Defaults to TTS_CACHE_MEMORY_MB.
+    """
+
+    def __init__(self, cache_dir=TTS_CACHE_DIR, max_mb=TTS_CACHE_MAX_MB, memory_mb=TTS_CACHE_MEMORY_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.memory_bytes = int(memory_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # key -> audio bytes
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._disk_size = sum(size for _, _, size in self._disk_entries())
+
+    @staticmethod
+    def key(text: str, voice: str, rate: str) -> str:
+        """Returns the content address of a phrase spoken with a voice and rate."""
+        return hashlib.sha256(f"{voice}\0{rate}\0{text.strip()}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".audio")
+
+    def get(self, text: str, voice: str, rate: str):
+        """Returns cached audio bytes, or None on a miss."""
+        key = self.key(text, voice, rate)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            path = self._path(key)
+            try:
+                with open(path, "rb") as file:
+                    audio = file.read()
+                os.utime(path)  # mtime is the disk-level LRU order
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, audio)
+            return audio
+
+    def put(self, text: str, voice: str, rate: str, audio: bytes) -> None:
+        """Stores audio for a phrase, evicting old entries if a budget is exceeded."""
+        key = self.key(text, voice, rate)
+        path = self._path(key)
+        with self._lock:
+            if os.path.exists(path):
+                self._disk_size -= os.path.getsize(path)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as file:
+                file.write(audio)
+            os.replace(tmp_path, path)  # readers never see a half-written file
+            self._disk_size += len(audio)
+            self._remember(key, audio)
+            self._evict_disk()
+
+    def _remember(self, key, audio):
+        if key in self._memory:
+            self._memory_size -= len(self._memory.pop(key))
+        self._memory[key] = audio
+        self._memory_size += len(audio)
+        while self._memory_size > self.memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _disk_entries(self):
+        """Returns [(mtime, path, size)] of cached files."""
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".audio"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _evict_disk(self):
+        if self._disk_size <= self.max_bytes:
+            return
+        for _, path, size in sorted(self._disk_entries()):
+            if self._disk_size <= self.max_bytes:
+                break
+            os.remove(path)
+            self._disk_size -= size
+            self._memory.pop(os.path.basename(path)[: -len(".audio")], None)
+        self._memory_size = sum(len(audio) for audio in self._memory.values())
+
+    def clear(self) -> None:
+        """Removes every cached entry."""
+        with self._lock:
+            for _, path, _ in self._disk_entries():
+                os.remove(path)
+            self._memory.clear()
+            self._memory_size = self._disk_size = 0
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current sizes."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_bytes": self._disk_size,
+            }
+
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_tts_cache() -> TTSCache:
+    """Returns the process-wide TTS cache."""
+    global _CACHE  # pylint: disable=global-statement
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = TTSCache()
+        return _CACHE
+
+
+async def prewarm(phrases, lang="auto") -> dict:
+    """Synthesizes phrases that aren't cached yet.
+
+    Args:
+        phrases (iterable): Phrases to cache.
+        lang (str, optional): "en", "ua", or "auto" to pick by script. Defaults to "auto".
+
+    Returns:
+        dict: Cache stats after pre-warming.
+    """
+    from src.transcribe_speak import synthesize  # pylint: disable=import-outside-toplevel
+
+    for phrase in phrases:
+        phrase = phrase.strip()
+        if not phrase:
+            continue
+        if lang == "auto":
+            phrase_lang = "ua" if any("\u0400" <= char <= "\u04FF" for char in phrase) else "en"
+        else:
+            phrase_lang = lang
+        await synthesize(text=phrase, lang=phrase_lang)
+    return get_tts_cache().stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the TTS audio cache.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    prewarm_cmd = commands.add_parser("prewarm", help="synthesize phrases from a file")
+    prewarm_cmd.add_argument("phrases", help="text file, one phrase per line")
+    prewarm_cmd.add_argument("--lang", default="auto", choices=["auto", "en", "ua"])
+    commands.add_parser("stats", help="print cache size")
+    commands.add_parser("clear", help="remove cached audio")
+    args = parser.parse_args()
+
+    if args.command == "prewarm":
+        with open(args.phrases, "r", encoding="utf-8") as f:
+            print(asyncio.run(prewarm(f.readlines(), lang=args.lang)))
+    elif args.command == "stats":
+        print(get_tts_cache().stats())
+    else:
+        get_tts_cache().clear()
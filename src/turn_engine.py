@@ -0,0 +1,149 @@
+"""Asynchronous turn engine for the console voice assistant
+
+Stages run concurrently and are connected by asyncio queues:
+  capture (microphone + VAD, own thread) -> utterances -> recognize (LID + STT)
+  -> prompts -> respond (LLM stream + speech pipeline)
+
+The microphone is opened and calibrated once. With barge-in enabled the engine keeps
+listening while the assistant speaks: when the user starts talking, the current LLM
+generation and playback are stopped and the new utterance becomes the next request.
+"""
+
+import asyncio
+import functools
+import queue
+import sys
+import threading
+
+sys.path.append("./")
+from src.audio import SAMPLE_RATE
+from src.audio_stream import EnergyVAD, MicrophoneStream
+from src.context import ContextManager
+from src.dispatch import transcribe_auto
+from src.history_store import HistoryStore
+from src.ollama_tts import ollama_prompt
+from src.speech_pipeline import get_speech_pipeline
+from src.tracing import TRACER
+from config import BARGE_IN, BARGE_IN_THRESHOLD_RATIO, OLLAMA_MODEL
+
+
+class TurnEngine:
+    """Listens, recognizes and answers; the next turn can start while one is spoken.
+
+    Args:
+        history (list): Conversation, starting with the system prompt; turns are appended.
+        context (ContextManager, optional): Picks what is sent to the LLM.
+        store (HistoryStore, optional): Persists messages as they're added.
+        barge_in (bool, optional): Let user speech interrupt the answer. Defaults to BARGE_IN.
+        model (str, optional): The Ollama model to use. Defaults to OLLAMA_MODEL.
+    """
+
+    def __init__(self, history: list, context: ContextManager = None, store: HistoryStore = None,
+                 barge_in=BARGE_IN, model=OLLAMA_MODEL):
+        self.history = history
+        self.context = context or ContextManager()
+        self.store = store
+        self.barge_in = barge_in
+        self.model = model
+        self._loop = None
+        self._utterances = None
+        self._prompts = None
+        self._closed = threading.Event()
+        self._stop_answer = threading.Event()
+        self._speaking = False
+        self._started_while_speaking = False
+        self._vad = EnergyVAD(on_speech_start=self._on_speech_start)
+        self._threshold = self._vad.energy_threshold
+
+    async def run(self) -> None:
+        """Runs until cancelled (e.g. Ctrl+C in asyncio.run)."""
+        self._loop = asyncio.get_running_loop()
+        self._utterances = asyncio.Queue()
+        self._prompts = asyncio.Queue()
+        with MicrophoneStream() as microphone:
+            self._threshold = await self._loop.run_in_executor(None, microphone.calibrate, self._vad)
+            capture = threading.Thread(target=self._capture, args=(microphone,), daemon=True)
+            capture.start()
+            print("Listening...\t\t Слухаю...")
+            try:
+                await asyncio.gather(self._recognize_stage(), self._respond_stage())
+            finally:
+                self._closed.set()
+                self._interrupt()
+                capture.join()
+
+    def _capture(self, microphone: MicrophoneStream) -> None:
+        """Capture stage (own thread): microphone blocks -> VAD -> utterance queue."""
+        while not self._closed.is_set():
+            try:
+                block = microphone.read(timeout=0.1)
+            except queue.Empty:
+                continue
+            for utterance in self._vad.feed(block):
+                if self._started_while_speaking and not self.barge_in:
+                    continue  # most likely the assistant's own voice
+                self._loop.call_soon_threadsafe(self._utterances.put_nowait, utterance)
+
+    def _on_speech_start(self) -> None:
+        """Called by the VAD in the capture thread when the user starts talking."""
+        self._started_while_speaking = self._speaking
+        if self._speaking and self.barge_in:
+            self._interrupt()
+
+    def _interrupt(self) -> None:
+        """Stops the current answer: LLM generation and queued/playing speech."""
+        self._stop_answer.set()
+        get_speech_pipeline().cancel()
+
+    def _set_speaking(self, speaking: bool) -> None:
+        self._speaking = speaking
+        # Speakers leak into the microphone, so interrupting needs louder speech
+        ratio = BARGE_IN_THRESHOLD_RATIO if speaking else 1.0
+        self._vad.energy_threshold = self._threshold * ratio
+
+    async def _recognize_stage(self) -> None:
+        """Utterances -> (language, transcript) prompts."""
+        while True:
+            audio = await self._utterances.get()
+            # A turn is timed from the end of the user's speech
+            turn = TRACER.start_turn(audio_s=round(len(audio) / SAMPLE_RATE, 3))
+            print("Working on it...\t Обробка...")
+            lang, text = await self._loop.run_in_executor(None, transcribe_auto, audio)
+            if lang == "en" and text == "Didn't recognize that.":
+                print("Didn't recognize that.\t\t Не зрозуміла.")
+                TRACER.end_turn(turn, recognized=False)
+                continue
+            print("Користувач:" if lang == "ua" else "User:", text)
+            await self._prompts.put((lang, text, turn))
+
+    async def _respond_stage(self) -> None:
+        """Prompts -> streamed LLM answer spoken by the speech pipeline, one at a time."""
+        while True:
+            lang, text, turn = await self._prompts.get()
+            self._stop_answer = threading.Event()
+            answer = self._loop.run_in_executor(
+                None,
+                functools.partial(
+                    ollama_prompt,
+                    prompt=f"{lang}: {text}",
+                    model=self.model,
+                    history=self.history,
+                    context=self.context,
+                    store=self.store,
+                    stop_event=self._stop_answer,
+                ),
+            )
+            self._set_speaking(True)
+            try:
+                # Shielded: on cancellation the answer is stopped, not abandoned mid-write
+                await asyncio.shield(answer)
+            except asyncio.CancelledError:
+                self._interrupt()
+                await answer
+                raise
+            finally:
+                self._set_speaking(False)
+            TRACER.end_turn(turn, lang=lang)
+            if self.store is not None:
+                self.store.compact_in_background()
+            print("Listening...\t\t Слухаю...")
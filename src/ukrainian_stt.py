@@ -1,25 +1,209 @@
 "Ukrainian Speech-to-text converter based on Wav2Vec2-Bert architecture"
+import os
+import sys
+
+import numpy as np
 import soundfile as sf
 import torch
 from transformers import AutoModelForCTC, Wav2Vec2BertProcessor
 from transformers.utils.logging import set_verbosity_error
 
+sys.path.append("./")
+from src.audio import read_audio
+from src.cpu_inference import (
+    OnnxCTCModel,
+    configure_cpu_threads,
+    export_ctc_onnx,
+    onnx_path_for,
+    quantize_int8,
+    resolve_engine,
+)
+from src.model_registry import REGISTRY, resolve_device
+from src.tracing import TRACER
+from config import UA_CHUNK_OVERLAP_SECONDS, UA_CHUNK_SECONDS
+
 set_verbosity_error()
 
+UA_MODEL_NAME = "Yehor/w2v-bert-2.0-uk"
+
+
+def _load_ua_model(model_name, device, engine="fp32"):
+    """Loads the Wav2Vec2-Bert model and processor (called by the registry on a miss)."""
+    processor = Wav2Vec2BertProcessor.from_pretrained(model_name)
+    if engine == "onnx":
+        onnx_path = onnx_path_for(model_name)
+        if not os.path.exists(onnx_path):
+            # One second of silence traces the graph, batch and time axes stay dynamic
+            example = processor(
+                [np.zeros(16000, dtype=np.float32)],
+                sampling_rate=16000,
+                return_attention_mask=True,
+                return_tensors="pt",
+            )
+            export_ctc_onnx(AutoModelForCTC.from_pretrained(model_name), example, onnx_path)
+        configure_cpu_threads()
+        return OnnxCTCModel(onnx_path), processor
+    asr_model = AutoModelForCTC.from_pretrained(model_name).to(device)
+    asr_model.eval()
+    if engine == "int8":
+        configure_cpu_threads()
+        asr_model = quantize_int8(asr_model)
+    return asr_model, processor
+
+
+def load_ua_model(model_name=UA_MODEL_NAME, device=None, engine=None):
+    """Returns the shared (model, processor) pair, loading it on first use.
+
+    Args:
+        model_name: Pre-trained model name. Defaults to "Yehor/w2v-bert-2.0-uk".
+        device: Device for computation. Defaults to "cuda:0" if available, else "cpu".
+        engine: "fp32", "int8" or "onnx". Defaults to fp32 on GPU, CPU_ENGINE on CPU.
+
+    Returns:
+        tuple: (AutoModelForCTC or OnnxCTCModel, Wav2Vec2BertProcessor)
+    """
+    device = resolve_device(device)
+    engine = resolve_engine(device, engine)
+    return REGISTRY.get(
+        f"{model_name}:{engine}",
+        device,
+        lambda _key, _device: _load_ua_model(model_name, _device, engine),
+    )
+
+
+def ua_transcribe_batch(
+    audios,
+    model_name=UA_MODEL_NAME,
+    device=None,
+    sampling_rate=16000,
+    engine=None,
+) -> list:
+    """Transcribes a batch of Ukrainian audios in one forward pass.
+
+    Args:
+        audios: List of audio file paths or 16 kHz mono float32 arrays. Similar lengths\
+            waste less time on padding.
+        model_name: Pre-trained model name. Defaults to "Yehor/w2v-bert-2.0-uk".
+        device: Device for computation. Defaults to "cuda:0" if available, else "cpu".
+        sampling_rate: Audio sampling rate. Defaults to 16000.
+        engine: "fp32", "int8" or "onnx". Defaults to fp32 on GPU, CPU_ENGINE on CPU.
+
+    Returns:
+        list: Transcribed texts, in the order of `audios`.
+    """
+    # Get the Wav2Vec2-Bert model and processor (loaded once per process)
+    device = resolve_device(device)
+    asr_model, processor = load_ua_model(model_name, device, engine)
+
+    # Preprocess the audio for model input, padding the batch to its longest item
+    inputs = processor(
+        [read_audio(audio) for audio in audios],
+        sampling_rate=sampling_rate,
+        padding=True,
+        return_attention_mask=True,
+        return_tensors="pt",
+    )
+    features = inputs.input_features.to(device)
+    attention_mask = inputs.attention_mask.to(device)
+
+    # Perform audio transcription with no gradient calculation
+    with torch.no_grad():
+        logits = asr_model(features, attention_mask=attention_mask).logits
+
+    # Decode the predicted token IDs to text
+    predicted_ids = torch.argmax(logits, dim=-1)
+    return processor.batch_decode(predicted_ids)
+
+
+def _windows(audio, window, overlap):
+    """Yields (block, is_last) windows of `window` samples overlapping by `overlap`.
+
+    Files are read block by block, so only one window is in memory at a time.
+    """
+    if isinstance(audio, np.ndarray):
+        total = len(audio)
+        blocks = (audio[start : start + window] for start in range(0, total, window - overlap))
+    else:
+        total = sf.info(audio).frames
+        blocks = sf.blocks(audio, blocksize=window, overlap=overlap, dtype="float32")
+    start = 0
+    for block in blocks:
+        is_last = start + len(block) >= total
+        yield read_audio(block), is_last
+        if is_last:
+            break
+        start += window - overlap
+
+
+def ua_transcribe_stream(
+    audio,
+    chunk_seconds=UA_CHUNK_SECONDS,
+    overlap_seconds=UA_CHUNK_OVERLAP_SECONDS,
+    model_name=UA_MODEL_NAME,
+    device=None,
+    sampling_rate=16000,
+    engine=None,
+):
+    """Transcribes long Ukrainian audio window by window, yielding partial transcripts.
+
+    Each window is `chunk_seconds` long plus `overlap_seconds` of context on both sides.
+    Only CTC frames of the window's central part are kept, so every moment of audio is
+    decoded by the window that saw it with context, and frames from neighbouring windows
+    are joined before CTC collapsing (a token cut by a window border isn't doubled).
+
+    Args:
+        audio: Audio file path or 16 kHz mono float32 array.
+        chunk_seconds: Audio decoded per window. Defaults to UA_CHUNK_SECONDS.
+        overlap_seconds: Context on each side of a window. Defaults to UA_CHUNK_OVERLAP_SECONDS.
+        model_name: Pre-trained model name. Defaults to "Yehor/w2v-bert-2.0-uk".
+        device: Device for computation. Defaults to "cuda:0" if available, else "cpu".
+        sampling_rate: Audio sampling rate. Defaults to 16000.
+        engine: "fp32", "int8" or "onnx". Defaults to fp32 on GPU, CPU_ENGINE on CPU.
+
+    Yields:
+        str: Transcript of the audio processed so far.
+    """
+    device = resolve_device(device)
+    asr_model, processor = load_ua_model(model_name, device, engine)
+    stride = int(chunk_seconds * sampling_rate)
+    overlap = int(overlap_seconds * sampling_rate)
+
+    kept_ids = []
+    for number, (block, is_last) in enumerate(_windows(audio, stride + 2 * overlap, 2 * overlap)):
+        inputs = processor([block], sampling_rate=sampling_rate).input_features
+        with torch.no_grad():
+            logits = asr_model(torch.tensor(inputs).to(device)).logits
+        ids = torch.argmax(logits, dim=-1)[0].tolist()
+
+        # Map the central part of the window (in samples) to logit frames
+        frames_per_sample = len(ids) / len(block)
+        keep_from = 0 if number == 0 else round(overlap * frames_per_sample)
+        keep_to = len(ids) if is_last else round((overlap + stride) * frames_per_sample)
+        kept_ids.extend(ids[keep_from:keep_to])
+        yield processor.decode(kept_ids)
+
 
 def ua_transcribe(
     file_paths="./data/wav/UA_test_2.wav",
-    model_name="Yehor/w2v-bert-2.0-uk",
-    device="cuda:0",
+    model_name=UA_MODEL_NAME,
+    device=None,
     sampling_rate=16000,
+    engine=None,
+    stop=None,
 ) -> str:
     """Transcribes Ukrainian audio using Wav2Vec2-Bert.
 
+    Audio longer than UA_CHUNK_SECONDS is transcribed in overlapping windows
+    (see ua_transcribe_stream) to keep memory use constant.
+
     Args:
-        file_paths: Audio file path(s). Defaults to "./data/wav/UA_test.wav".
+        file_paths: Audio file path or 16 kHz mono float32 array. Defaults to "./data/wav/UA_test.wav".
         model_name: Pre-trained model name. Defaults to "Yehor/w2v-bert-2.0-uk".
-        device: Device for computation. Defaults to "cuda:0" if available.
+        device: Device for computation. Defaults to "cuda:0" if available, else "cpu".
         sampling_rate: Audio sampling rate. Defaults to 16000.
+        engine: "fp32", "int8" or "onnx". Defaults to fp32 on GPU, CPU_ENGINE on CPU.
+        stop: threading.Event; once it's set, no further window is decoded and the
+            transcript so far ("" if none) is returned. Defaults to None.
 
     Returns:
         Transcribed text.
@@ -27,30 +211,33 @@ def ua_transcribe(
     Raises:
         Exception: On errors.
     """
-
-    # Load the Wav2Vec2-Bert model and processor
-    asr_model = AutoModelForCTC.from_pretrained(model_name).to(device)
-    processor = Wav2Vec2BertProcessor.from_pretrained(model_name)
-
-    # Extract audio data from the provided file paths
-    audio_inputs = []
-    file_paths = [file_paths]  # Ensure file_paths is a list
-    for path in file_paths:
-        audio_input, _ = sf.read(path)
-        audio_inputs.append(audio_input)
-
-    # Preprocess the audio for model input
-    inputs = processor(audio_inputs, sampling_rate=sampling_rate).input_features
-    features = torch.tensor(inputs).to(device)
-
-    # Perform audio transcription with no gradient calculation
-    with torch.no_grad():
-        logits = asr_model(features).logits
-
-    # Decode the predicted token IDs to text
-    predicted_ids = torch.argmax(logits, dim=-1)
-    prdct = processor.batch_decode(predicted_ids)[0]
-    return prdct
+    if isinstance(file_paths, np.ndarray):
+        samples = len(file_paths)
+    else:
+        samples = sf.info(file_paths).frames
+    chunked = samples > (UA_CHUNK_SECONDS + 2 * UA_CHUNK_OVERLAP_SECONDS) * sampling_rate
+    with TRACER.span("stt.ua", audio_s=round(samples / sampling_rate, 3), chunked=chunked):
+        if chunked:
+            transcript = ""
+            for transcript in ua_transcribe_stream(
+                file_paths,
+                model_name=model_name,
+                device=device,
+                sampling_rate=sampling_rate,
+                engine=engine,
+            ):
+                if stop is not None and stop.is_set():
+                    break
+            return transcript
+        if stop is not None and stop.is_set():
+            return ""
+        return ua_transcribe_batch(
+            [file_paths],
+            model_name=model_name,
+            device=device,
+            sampling_rate=sampling_rate,
+            engine=engine,
+        )[0]
 
 
 if __name__ == "__main__":
@@ -1,16 +1,16 @@
 """Converts audio from stereo to mono"""
 
 import re
-import speech_recognition as sr
 
 
-def convert_audio_to_wav(audio_file, output_file) -> sr.AudioFile:
+def convert_audio_to_wav(audio_file, output_file):
     """Converts audio file to a 16000 Hz WAV file.
 
     Args:
       audio_file: Path to the input audio file.
       output_file: Path to the output WAV file.
     """
+    import speech_recognition as sr  # pylint: disable=import-outside-toplevel
 
     recognizer = sr.Recognizer()
     recognizer.pause_threshold = 0.8